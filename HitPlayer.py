@@ -1,5 +1,5 @@
 import os
-from PyQt5.QtCore import QDir, Qt, QUrl, QTime, QThread, pyqtSignal, QTimer
+from PyQt5.QtCore import QDir, Qt, QUrl, QTime, QThread, pyqtSignal, QTimer, QObject
 from PyQt5.QtMultimedia import QMediaContent, QMediaPlayer
 from PyQt5.QtMultimediaWidgets import QVideoWidget
 from PyQt5.QtWidgets import (
@@ -9,10 +9,22 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QMessageBox
-from pytube import YouTube
+import json
 import sys
+from collections import deque
+from urllib.parse import quote
+from urllib.request import urlopen
 
-os.environ["QT_QPA_PLATFORM"] = "wayland"
+from hitplayer_core import (
+    AUDIO_FILE_EXTENSIONS, MEDIA_EXTENSIONS, AdmissionController, DownloadError, LibraryIndex, StreamPolicy,
+    download_video, quota_from_environment, scan_roots
+)
+from hitplayer_core.prefetch import Prefetcher, StartupTimer, predict_next
+from hitplayer_core.server import SERVER_ENVIRONMENT_VARIABLE
+from hitplayer_core.transcode import TranscodePool
+
+# Wayland unless the environment picks another platform, e.g. offscreen on headless machines
+os.environ.setdefault("QT_QPA_PLATFORM", "wayland")
 
 
 class DownloadThread(QThread):
@@ -22,25 +34,18 @@ class DownloadThread(QThread):
         super(DownloadThread, self).__init__(parent)
         self.url = url
         self.video_directory = video_directory
-        self.default_resolution = "720p"
+        self.stream_policy = StreamPolicy()
+        self.admission = None
 
     def run(self):
         try:
-            yt = YouTube(self.url)
-            video_stream = yt.streams.filter(file_extension="mp4", progressive=True,
-                                             resolution=self.default_resolution).first()
-
-            if video_stream is not None:
-                new_video_name = video_stream.title.lower().replace(' ', '') + '.mp4'
-                video_file_path = os.path.join(self.video_directory, new_video_name)
-
-                video_stream.download(self.video_directory)
+            new_video_name = download_video(self.url, self.video_directory, self.stream_policy,
+                                            admission=self.admission)
 
-                # Emit signal to indicate download completion
-                self.download_complete.emit(new_video_name)
-            else:
-                # Video stream is not available
-                print("Error downloading video: Video stream is not available.")
+            # Emit signal to indicate download completion
+            self.download_complete.emit(new_video_name)
+        except DownloadError as e:
+            print(f"Error downloading video: {str(e)}")
         except Exception as e:
             # Print the exception traceback for debugging
             import traceback
@@ -48,14 +53,28 @@ class DownloadThread(QThread):
             print(f"Error downloading video: {str(e)}")
 
 
+class TranscodeSignals(QObject):
+    # Transcode jobs report from pool threads, so hop back to the GUI thread via signals
+    progress = pyqtSignal(str, int)
+    finished = pyqtSignal(str, str)
+    failed = pyqtSignal(str, str)
+
+
 class VideoWindow(QMainWindow):
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, media_player=None, audio_only=False):
         super(VideoWindow, self).__init__(parent)
-        self.setWindowTitle("PyQt Video Player Widget Example")
+        self.setWindowTitle("PyQt Audio Player" if audio_only else "PyQt Video Player Widget Example")
 
-        self.mediaPlayer = QMediaPlayer(None, QMediaPlayer.VideoSurface)
+        # The audio view lists music only and never sets up a video surface
+        self.audio_only = audio_only
+        self.media_extensions = AUDIO_FILE_EXTENSIONS if audio_only else MEDIA_EXTENSIONS
 
-        videoWidget = QVideoWidget()
+        # Any object with QMediaPlayer's signals and methods works, e.g. a simulated player
+        if media_player is None:
+            media_player = QMediaPlayer() if audio_only else QMediaPlayer(None, QMediaPlayer.VideoSurface)
+        self.mediaPlayer = media_player
+
+        videoWidget = None if audio_only else QVideoWidget()
 
         self.playButton = QPushButton()
         self.playButton.setEnabled(False)
@@ -97,15 +116,49 @@ class VideoWindow(QMainWindow):
         setVideoDirAction.setStatusTip('Set Video Directory')
         setVideoDirAction.triggered.connect(self.setVideoDirectory)
 
+        addVideoDirAction = QAction('&Add Video Directory', self)
+        addVideoDirAction.setShortcut('Ctrl+Shift+D')
+        addVideoDirAction.setStatusTip('Add another directory to the library')
+        addVideoDirAction.triggered.connect(self.addVideoDirectory)
+
+        self.scanSubdirectoriesAction = QAction('Include &Subdirectories', self, checkable=True)
+        self.scanSubdirectoriesAction.setStatusTip('Also list videos in subdirectories of the library directories')
+        self.scanSubdirectoriesAction.triggered.connect(self.refreshVideoPlayer)
+
         menuBar = self.menuBar()
         fileMenu = menuBar.addMenu('&File')
         fileMenu.addAction(openAction)
         fileMenu.addAction(setVideoDirAction)
+        fileMenu.addAction(addVideoDirAction)
+        fileMenu.addAction(self.scanSubdirectoriesAction)
         fileMenu.addAction(exit_action)
 
         viewMenu = menuBar.addMenu('&View')
         viewMenu.addAction(fullscreen_action)
 
+        metricsAction = QAction('Playback &Metrics', self)
+        metricsAction.setStatusTip('Show prefetch hit rate and startup latency')
+        metricsAction.triggered.connect(self.showPlaybackMetrics)
+        viewMenu.addAction(metricsAction)
+
+        libraryStatusAction = QAction('&Library Status', self)
+        libraryStatusAction.setStatusTip('Show scan results and timing per library directory')
+        libraryStatusAction.triggered.connect(self.showLibraryStatus)
+        viewMenu.addAction(libraryStatusAction)
+
+        self.faststartAction = QAction('Optimize Downloads for Fast Start', self, checkable=True)
+        self.faststartAction.setStatusTip('Remux downloaded videos so playback starts without reading the whole file')
+        self.shrinkAction = QAction('Shrink Downloads to 720p H.264', self, checkable=True)
+        self.shrinkAction.setStatusTip('Re-encode downloaded videos to a smaller 720p profile')
+        repairAction = QAction('Repair Selected Video', self)
+        repairAction.setStatusTip('Remux the selected video into a fast-start mp4')
+        repairAction.triggered.connect(self.repairSelectedVideo)
+
+        toolsMenu = menuBar.addMenu('&Tools')
+        toolsMenu.addAction(self.faststartAction)
+        toolsMenu.addAction(self.shrinkAction)
+        toolsMenu.addAction(repairAction)
+
         wid = QWidget(self)
         self.setCentralWidget(wid)
 
@@ -135,7 +188,8 @@ class VideoWindow(QMainWindow):
         controlLayout.addWidget(refreshButton)
 
         layout = QVBoxLayout()
-        layout.addWidget(videoWidget)
+        if videoWidget is not None:
+            layout.addWidget(videoWidget)
         layout.addLayout(controlLayout)
         layout.addWidget(self.errorLabel)
         layout.addWidget(self.videoListWidget)
@@ -152,7 +206,7 @@ class VideoWindow(QMainWindow):
 
         layout.addLayout(deleteLayout)  # Add the deleteLayout to the main layout
 
-        downloadButton = QPushButton("Download YouTube Video")
+        downloadButton = QPushButton("Download YouTube Audio" if audio_only else "Download YouTube Video")
         downloadButton.clicked.connect(self.downloadVideo)
 
         deleteLayout.addWidget(downloadButton)
@@ -180,22 +234,47 @@ class VideoWindow(QMainWindow):
 
         layout.addWidget(self.messageLabel)
 
+        self.transcodeProgressBar = QProgressBar()
+        self.transcodeProgressBar.setRange(0, 100)
+        self.transcodeProgressBar.hide()
+        layout.addWidget(self.transcodeProgressBar)
+
         wid.setLayout(layout)
 
-        self.mediaPlayer.setVideoOutput(videoWidget)
+        if videoWidget is not None:
+            self.mediaPlayer.setVideoOutput(videoWidget)
         self.mediaPlayer.stateChanged.connect(self.mediaStateChanged)
         self.mediaPlayer.positionChanged.connect(self.positionChanged)
         self.mediaPlayer.durationChanged.connect(self.durationChanged)
 
+        self.mediaPlayer.mediaStatusChanged.connect(self.mediaStatusChanged)
+
         self.mediaPlayer.error.connect(self.handleError)
 
         # Enable keyboard focus for the window
         self.setFocusPolicy(Qt.StrongFocus)
 
         self.video_directory = '/home/user/Videos'  # Default video directory
+        self.media_server = os.environ.get(SERVER_ENVIRONMENT_VARIABLE)  # e.g. http://mediabox:8765
+        self.video_directories = [self.video_directory]  # Library roots, scanned in parallel
+        self.library_indexes = {}  # Play statistics per root
+        self.last_scan = None
         self.download_thread = DownloadThread("", "")  # Placeholder, will be set in downloadVideo method
+        if audio_only:
+            self.download_thread.stream_policy = StreamPolicy(audio_only=True)
         self.download_thread.download_complete.connect(self.onDownloadComplete)
 
+        self.transcode_pool = None  # Created on first use
+        self.transcodeSignals = TranscodeSignals()
+        self.transcodeSignals.progress.connect(self.onTranscodeProgress)
+        self.transcodeSignals.finished.connect(self.onTranscodeFinished)
+        self.transcodeSignals.failed.connect(self.onTranscodeFailed)
+
+        # Warm the next videos in the list while the current one plays
+        self.prefetcher = Prefetcher()
+        self.startupTimer = StartupTimer()
+        self.play_history = deque(maxlen=50)
+
     def toggleAutoPlay(self):
         self.auto_play = not self.auto_play
         if self.auto_play:
@@ -205,7 +284,8 @@ class VideoWindow(QMainWindow):
         options = QFileDialog.Options()
         options |= QFileDialog.DontUseNativeDialog
         fileName, _ = QFileDialog.getOpenFileName(self, "Open Video File", "",
-                                                  "Video Files (*.mp4 *.avi *.mkv);;All Files (*)", options=options)
+                                                  "Media Files (*.mp4 *.avi *.mkv *.m4a *.webm *.mp3 *.opus *.ogg "
+                                                  "*.flac);;All Files (*)", options=options)
         if fileName:
             self.mediaPlayer.setMedia(QMediaContent(QUrl.fromLocalFile(fileName)))
             self.playButton.setEnabled(True)
@@ -215,11 +295,7 @@ class VideoWindow(QMainWindow):
         if video_count > 0:
             self.current_video_index = (self.current_video_index + 1) % video_count
             video_item = self.videoListWidget.item(self.current_video_index)
-            video_path = os.path.join(self.video_directory, video_item.text())
-            video_url = QUrl.fromLocalFile(video_path)
-            self.mediaPlayer.setMedia(QMediaContent(video_url))
-            self.playButton.setEnabled(True)
-            self.mediaPlayer.play()
+            self.startVideo(video_item)
 
     def mediaStateChanged(self, state):
         if state == QMediaPlayer.StoppedState and self.auto_play:
@@ -257,17 +333,100 @@ class VideoWindow(QMainWindow):
         self.playButton.setEnabled(False)
         self.errorLabel.setText("Error: " + self.mediaPlayer.errorString())
 
-    def videoSelected(self, item):
-        video_path = os.path.join(self.video_directory, item.text())
-
+    def createVideoItem(self, root, video_name):
+        # Names are relative to their library root, which rides along as item data
+        item = QListWidgetItem(video_name)
+        item.setData(Qt.UserRole, root)
+        if root is not None:
+            item.setToolTip(os.path.join(root, video_name))
+        return item
+
+    def isServerItem(self, item):
+        # Media server entries have no local root, so there is no file to touch
+        return item.data(Qt.UserRole) is None
+
+    def videoPath(self, item):
+        return os.path.join(item.data(Qt.UserRole), item.text())
+
+    def indexFor(self, root):
+        if root not in self.library_indexes:
+            self.library_indexes[root] = LibraryIndex(root)
+        return self.library_indexes[root]
+
+    def videoUrl(self, item):
+        if self.media_server:
+            # Stream from the shared media server instead of opening the file ourselves
+            return QUrl(self.media_server.rstrip('/') + '/media/' + quote(item.text()))
         # Use QUrl.fromLocalFile directly without additional conversions
-        video_url = QUrl.fromLocalFile(video_path)
+        return QUrl.fromLocalFile(self.videoPath(item))
+
+    def listVideoFiles(self):
+        """(root, name) pairs for every video; root is None for media server entries."""
+        if self.media_server:
+            try:
+                with urlopen(self.media_server.rstrip('/') + '/library.json', timeout=10) as response:
+                    return [(None, entry["name"]) for entry in json.load(response)
+                            if entry["name"].endswith(self.media_extensions)]
+            except (OSError, ValueError) as e:
+                self.showMessage(f"Could not reach media server: {str(e)}", success=False)
+                return []
+
+        self.last_scan = scan_roots(self.video_directories, self.scanSubdirectoriesAction.isChecked(),
+                                    self.media_extensions)
+        failed = [status.root for status in self.last_scan.roots.values() if not status.ok]
+        if failed:
+            self.showMessage(f"Could not read video directories: {', '.join(failed)}", success=False)
+        return self.last_scan.videos
+
+    def videoSelected(self, item):
+        # Autoplay continues from the clicked video
+        self.current_video_index = self.videoListWidget.row(item)
+        self.startVideo(item)  # Autoplay when clicking on the video list item
+
+    def startVideo(self, item):
+        root = item.data(Qt.UserRole)
+        prefetched = False
+        if root is not None:
+            self.indexFor(root).record_play(item.text())
+            self.play_history.append(self.videoPath(item))
+            prefetched = self.prefetcher.note_play(self.videoPath(item))
+        self.startupTimer.start(prefetched)
 
         # Set the media with the corrected QUrl
-        self.mediaPlayer.setMedia(QMediaContent(video_url))
+        self.mediaPlayer.setMedia(QMediaContent(self.videoUrl(item)))
 
         self.playButton.setEnabled(True)
-        self.mediaPlayer.play()  # Autoplay when clicking on the video list item
+        self.mediaPlayer.play()
+        self.prefetchNextVideos()
+
+    def prefetchNextVideos(self):
+        # The media server box has its own page cache; only warm local files
+        if self.media_server:
+            return
+        order = [self.videoPath(self.videoListWidget.item(i)) for i in range(self.videoListWidget.count())]
+        self.prefetcher.schedule(predict_next(order, self.current_video_index, self.play_history,
+                                              self.prefetcher.depth))
+
+    def showLibraryStatus(self):
+        if self.last_scan is None:
+            self.showMessage("The library has not been scanned yet.", success=False)
+            return
+        lines = []
+        for status in self.last_scan.roots.values():
+            state = f"{status.count} videos" if status.ok else f"error: {status.error}"
+            lines.append(f"{status.root}: {state} in {status.seconds:.2f}s")
+        QMessageBox.information(self, "Library Status", "\n".join(lines))
+
+    def mediaStatusChanged(self, status):
+        if status == QMediaPlayer.BufferedMedia:
+            elapsed = self.startupTimer.stop()
+            if elapsed is not None:
+                self.prefetcher.metrics.record_startup(elapsed, self.startupTimer.prefetched)
+
+    def showPlaybackMetrics(self):
+        metrics = self.prefetcher.metrics.snapshot()
+        QMessageBox.information(self, "Playback Metrics",
+                                "\n".join(f"{name.replace('_', ' ')}: {value}" for name, value in metrics.items()))
 
     def downloadVideo(self):
         url, okPressed = QInputDialog.getText(self, "Download YouTube Video", "Enter YouTube URL:", QLineEdit.Normal,
@@ -276,6 +435,9 @@ class VideoWindow(QMainWindow):
             # Set the URL, directory, and resolution for the download thread
             self.download_thread.url = url
             self.download_thread.video_directory = self.video_directory
+            # Evicts least recently played videos when over the library quota
+            self.download_thread.admission = AdmissionController(self.video_directory, quota_from_environment(),
+                                                                 index=self.indexFor(self.video_directory))
 
             # Start the download thread
             self.download_thread.start()
@@ -284,7 +446,7 @@ class VideoWindow(QMainWindow):
         # This method is called when the download is complete
         video_path = os.path.join(self.video_directory, new_video_name)
 
-        item = QListWidgetItem(new_video_name)
+        item = self.createVideoItem(self.video_directory, new_video_name)
         self.videoListWidget.addItem(item)
 
         # Show success message
@@ -293,6 +455,61 @@ class VideoWindow(QMainWindow):
         self.videoListWidget.setCurrentItem(item)
         self.updateVideoList()
 
+        # Audio downloads are already stored compactly; the transcode profiles are for video
+        if new_video_name.endswith(AUDIO_FILE_EXTENSIONS):
+            return
+        if self.shrinkAction.isChecked():
+            self.transcodeVideo(video_path, "h264-720p")
+        elif self.faststartAction.isChecked():
+            self.transcodeVideo(video_path, "faststart")
+
+    def transcodeVideo(self, video_path, profile):
+        if self.transcode_pool is None:
+            self.transcode_pool = TranscodePool()
+        name = os.path.basename(video_path)
+        self.transcodeProgressBar.setValue(0)
+        self.transcodeProgressBar.setFormat(f"{name}: %p%")
+        self.transcodeProgressBar.show()
+
+        def progress(percent):
+            self.transcodeSignals.progress.emit(name, percent)
+
+        def done(future):
+            try:
+                self.transcodeSignals.finished.emit(name, os.path.basename(future.result()))
+            except Exception as e:
+                self.transcodeSignals.failed.emit(name, str(e))
+
+        future = self.transcode_pool.submit(video_path, profile, on_progress=progress)
+        future.add_done_callback(done)
+
+    def repairSelectedVideo(self):
+        item = self.videoListWidget.currentItem()
+        if item is None:
+            self.showMessage("No video selected for repair.", success=False)
+            return
+        if self.isServerItem(item):
+            self.showMessage("Videos on the media server can't be repaired from here.", success=False)
+            return
+        video_path = self.videoPath(item)
+        # Release the file before it gets replaced
+        self.mediaPlayer.stop()
+        self.mediaPlayer.setMedia(QMediaContent())
+        self.transcodeVideo(video_path, "faststart")
+
+    def onTranscodeProgress(self, name, percent):
+        self.transcodeProgressBar.setFormat(f"{name}: %p%")
+        self.transcodeProgressBar.setValue(percent)
+
+    def onTranscodeFinished(self, name, new_name):
+        self.transcodeProgressBar.hide()
+        self.showMessage(f"Video optimized: {new_name}", success=True)
+        self.updateVideoList()
+
+    def onTranscodeFailed(self, name, error):
+        self.transcodeProgressBar.hide()
+        self.showMessage(f"Could not optimize {name}: {error}", success=False)
+
     def showMessage(self, message, success=True):
         self.messageLabel.setText(f"<font color={'green' if success else 'red'}>{message}</font>")
         self.messageLabel.show()
@@ -330,20 +547,25 @@ class VideoWindow(QMainWindow):
         action = menu.exec_(self.videoListWidget.mapToGlobal(position))
         if action == remove_action:
             selected_items = self.videoListWidget.selectedItems()
+            if any(self.isServerItem(item) for item in selected_items):
+                self.showMessage("Videos on the media server can't be removed from here.", success=False)
+                return
             for item in selected_items:
                 row = self.videoListWidget.row(item)
                 self.videoListWidget.takeItem(row)
-                video_path = os.path.join(self.video_directory, item.text())
-                os.remove(video_path)
+                os.remove(self.videoPath(item))
+                self.indexFor(item.data(Qt.UserRole)).remove(item.text())
 
     def deleteSelectedVideo(self):
         selected_items = self.videoListWidget.selectedItems()
-        if selected_items:
+        if any(self.isServerItem(item) for item in selected_items):
+            self.showMessage("Videos on the media server can't be deleted from here.", success=False)
+        elif selected_items:
             for item in selected_items:
                 row = self.videoListWidget.row(item)
                 self.videoListWidget.takeItem(row)
-                video_path = os.path.join(self.video_directory, item.text())
-                os.remove(video_path)
+                os.remove(self.videoPath(item))
+                self.indexFor(item.data(Qt.UserRole)).remove(item.text())
                 self.showMessage(f"Video deleted successfully: {item.text()}", success=True)
                 self.refreshVideoPlayer()
         else:
@@ -351,14 +573,14 @@ class VideoWindow(QMainWindow):
 
     def updateVideoList(self):
         # Reload video files from the directory
-        video_files = [f for f in os.listdir(self.video_directory) if f.endswith(('.mp4', '.avi', '.mkv'))]
+        video_files = self.listVideoFiles()
 
         # Clear existing items in the video list widget
         self.videoListWidget.clear()
 
         # Populate the list with the updated video files
-        for video_file in video_files:
-            item = QListWidgetItem(video_file)
+        for root, video_file in video_files:
+            item = self.createVideoItem(root, video_file)
             self.videoListWidget.addItem(item)
 
         # Restore the current item if it exists
@@ -388,14 +610,14 @@ class VideoWindow(QMainWindow):
         self.errorLabel.clear()
 
         # Reload video files from the directory
-        video_files = [f for f in os.listdir(self.video_directory) if f.endswith(('.mp4', '.avi', '.mkv'))]
+        video_files = self.listVideoFiles()
 
         # Clear existing items in the video list widget
         self.videoListWidget.clear()
 
         # Populate the list with the updated video files
-        for video_file in video_files:
-            item = QListWidgetItem(video_file)
+        for root, video_file in video_files:
+            item = self.createVideoItem(root, video_file)
             self.videoListWidget.addItem(item)
 
         # Restore the current item if it exists
@@ -438,11 +660,19 @@ class VideoWindow(QMainWindow):
         directory = QFileDialog.getExistingDirectory(self, "Select Video Directory", QDir.homePath())
         if directory:
             self.video_directory = directory
+            self.video_directories = [directory]
+            self.refreshVideoPlayer()
+
+    def addVideoDirectory(self):
+        directory = QFileDialog.getExistingDirectory(self, "Add Video Directory", QDir.homePath())
+        if directory and directory not in self.video_directories:
+            self.video_directories.append(directory)
             self.refreshVideoPlayer()
 
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
-    player = VideoWindow()
+    # --audio opens the music view: audio files only, no video surface
+    player = VideoWindow(audio_only="--audio" in sys.argv[1:])
     player.show()
     sys.exit(app.exec_())
@@ -1,60 +1,62 @@
 import os
 import sys
-from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout, QProgressBar, QFileDialog
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QLabel, QLineEdit, QPushButton, QVBoxLayout, QProgressBar, QFileDialog, QSpinBox,
+    QCheckBox
+)
+from PyQt5.QtCore import QObject, pyqtSignal
 from PyQt5.QtGui import QColor
 
-from pytube import YouTube, Playlist
+from hitplayer_core import AdmissionController, JobManager, StreamPolicy, download_video, quota_from_environment
+from hitplayer_core.jobs import STATE_FILE_NAME
+from hitplayer_core.throttle import limiter_from_environment
 
-class DownloadThread(QThread):
+class PlaylistJobs(QObject):
     download_complete = pyqtSignal(str, int)
 
-    def __init__(self, url, video_directory, parent=None):
-        super(DownloadThread, self).__init__(parent)
-        self.url = url
+    def __init__(self, video_directory, limiter, workers=4, parent=None):
+        super(PlaylistJobs, self).__init__(parent)
         self.video_directory = video_directory
-
-    def run(self):
-        try:
-            if "playlist" in self.url.lower():
-                playlist = Playlist(self.url)
-                total_videos = len(playlist.video_urls)
-                for index, video_url in enumerate(playlist.video_urls):
-                    self.download_video(video_url)
-                    self.download_complete.emit(video_url, int((index + 1) / total_videos * 100))
-            else:
-                self.download_video(self.url)
-        except Exception as e:
-            # Handle exceptions
-            print(f"Error downloading video(s): {str(e)}")
-
-    def download_video(self, video_url):
-        try:
-            yt = YouTube(video_url)
-            video_stream = yt.streams.filter(file_extension="mp4", resolution="720p", progressive=True).first()
-
-            if video_stream is not None:
-                new_video_name = video_stream.title.lower().replace(' ', '') + '.mp4'
-                video_file_path = os.path.join(self.video_directory, new_video_name)
-
-                video_stream.download(self.video_directory)
-
-                # Emit signal to indicate download completion
-                self.download_complete.emit(new_video_name, 100)
-            else:
-                # Video stream is not available
-                print("Error downloading video: Video stream is not available.")
-        except Exception as e:
-            # Print the exception traceback for debugging
-            import traceback
-            traceback.print_exc()
-            print(f"Error downloading video: {str(e)}")
+        self.limiter = limiter
+        self.admission = AdmissionController(video_directory, quota_from_environment(),
+                                             on_pause=self.report_paused)
+        # One manager for every click: shared worker pool, no duplicate videos,
+        # and an interrupted batch is resumed from the state file
+        self.manager = JobManager(self.download_video, os.path.join(video_directory, STATE_FILE_NAME), workers,
+                                  on_event=self.handle_event)
+        self.manager.resume()
+
+    def add(self, urls, audio_only=False):
+        self.manager.add(urls, audio_only)
+
+    def download_video(self, video_url, audio_only):
+        policy = StreamPolicy(audio_only=True) if audio_only else None
+        return download_video(video_url, self.video_directory, policy, admission=self.admission,
+                              limiter=self.limiter)
+
+    def handle_event(self, event, **fields):
+        if event == "done" or (event == "error" and "url" in fields):
+            counts = self.manager.counts()
+            total = counts["pending"] + counts["running"] + counts["done"] + counts["failed"]
+            progress = int((counts["done"] + counts["failed"]) / total * 100) if total else 100
+            self.download_complete.emit(fields.get("file") or fields["url"], progress)
+        if event == "error":
+            print(f"Error downloading video(s): {fields['error']}")
+        elif event == "expanded":
+            print(f"Found {fields['videos']} videos ({fields['new']} new) in {fields['source']}")
+
+    def report_paused(self, needed_bytes, free_bytes):
+        print(f"Download paused until {needed_bytes // (1 << 20)} MiB fit on disk "
+              f"({free_bytes // (1 << 20)} MiB free)")
 
 
 class MainWindow(QWidget):
     def __init__(self):
         super().__init__()
 
+        self.jobs = None
+        # Follows HITPLAYER_BANDWIDTH_SCHEDULE unless a limit is set in the window
+        self.limiter = limiter_from_environment()
         self.init_ui()
 
     def init_ui(self):
@@ -67,21 +69,31 @@ class MainWindow(QWidget):
         p.setColor(self.backgroundRole(), QColor(240, 240, 240))  # Light gray background
         self.setPalette(p)
 
-        self.playlist_url_label = QLabel('Playlist URL:')
+        self.playlist_url_label = QLabel('Playlist, channel or video URLs (separate with spaces):')
         self.playlist_url_input = QLineEdit(self)
         self.playlist_directory = QLineEdit(self)
         self.select_url_button = QPushButton('Select Download Directory', self)
         self.start_download_button = QPushButton('Start Download Playlist', self)
+        self.audio_only_check_box = QCheckBox('Audio only (music playlists)', self)
         self.progress_bar = QProgressBar(self)
         self.progress_bar.setGeometry(10, 220, 580, 20)  # Adjusted progress bar size
+        self.limit_label = QLabel('Bandwidth limit:')
+        self.limit_spin_box = QSpinBox(self)
+        self.limit_spin_box.setRange(0, 1000000)
+        self.limit_spin_box.setSuffix(' KiB/s')
+        self.limit_spin_box.setSpecialValueText('Schedule / unlimited')
+        self.limit_spin_box.valueChanged.connect(self.update_bandwidth_limit)
 
         vbox = QVBoxLayout()
         vbox.addWidget(self.playlist_url_label)
         vbox.addWidget(self.playlist_url_input)
         vbox.addWidget(self.playlist_directory)
         vbox.addWidget(self.select_url_button)
+        vbox.addWidget(self.audio_only_check_box)
         vbox.addWidget(self.start_download_button)
         vbox.addWidget(self.progress_bar)
+        vbox.addWidget(self.limit_label)
+        vbox.addWidget(self.limit_spin_box)
 
         self.setLayout(vbox)
 
@@ -118,12 +130,29 @@ class MainWindow(QWidget):
             self.playlist_directory.setText(video_directory)
 
     def start_download(self):
-        playlist_url = self.playlist_url_input.text()
+        playlist_urls = self.playlist_url_input.text().split()
         video_directory = self.playlist_directory.text()
 
-        self.download_thread = DownloadThread(playlist_url, video_directory)
-        self.download_thread.download_complete.connect(self.update_progress)
-        self.download_thread.start()
+        if not playlist_urls or not video_directory:
+            print("Error: URL or download directory not given.")
+            return
+
+        if self.jobs is None or self.jobs.video_directory != video_directory:
+            if self.jobs is not None and self.jobs.manager.busy:
+                print("Error: wait for the current downloads to finish before changing the directory.")
+                return
+            self.jobs = PlaylistJobs(video_directory, self.limiter)
+            self.jobs.download_complete.connect(self.update_progress)
+
+        self.jobs.add(playlist_urls, self.audio_only_check_box.isChecked())
+        self.playlist_url_input.clear()
+
+    def update_bandwidth_limit(self, kib_per_second):
+        # Applies to downloads already running, from their next chunk on
+        if kib_per_second:
+            self.limiter.set_rate(kib_per_second * 1024)
+        else:
+            self.limiter.follow_schedule()
 
     def update_progress(self, video_name, progress):
         print(f"Downloaded: {video_name}, Progress: {progress}%")
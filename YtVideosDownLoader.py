@@ -1,36 +1,44 @@
-import os
 import json
-from pytube import YouTube
-from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QPushButton, QFileDialog, QLabel, QProgressBar
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QVBoxLayout, QPushButton, QFileDialog, QLabel, QProgressBar, QSpinBox, QCheckBox
+)
 from PyQt5.QtCore import QThread, pyqtSignal, QObject
 
+from hitplayer_core import (
+    AdmissionController, DownloadError, EngineThread, StreamPolicy, download_video, quota_from_environment
+)
+from hitplayer_core.throttle import limiter_from_environment
+
 
 class DownloadThread(QThread):
     download_complete = pyqtSignal(str)
 
-    def __init__(self, song_name, video_url, download_directory):
+    def __init__(self, song_name, video_url, download_directory, engine=None, admission=None, limiter=None,
+                 audio_only=False):
         super(DownloadThread, self).__init__()
         self.song_name = song_name
         self.video_url = video_url
         self.download_directory = download_directory
+        self.engine = engine
+        self.admission = admission
+        self.limiter = limiter
+        self.audio_only = audio_only
 
     def run(self):
         try:
-            yt = YouTube(self.video_url)
-            video_stream = yt.streams.filter(file_extension="mp4", progressive=True).first()
-
-            if video_stream is not None:
-                new_video_name = video_stream.title.lower().replace(' ', '') + '.mp4'
-                video_file_path = os.path.join(self.download_directory, new_video_name)
-
-                # Download video without showing progress (for simplicity)
-                video_stream.download(self.download_directory)
-
-                # Emit signal to indicate download completion
-                self.download_complete.emit(new_video_name)
+            if self.audio_only:
+                # Best audio stream only, tagged with the song name from the JSON file
+                policy = StreamPolicy(audio_only=True)
+                tags = {"title": self.song_name} if self.song_name else None
             else:
-                # Video stream is not available
-                print(f"Error downloading video '{self.song_name}': Video stream is not available.")
+                policy, tags = None, None
+            new_video_name = download_video(self.video_url, self.download_directory, policy, engine=self.engine,
+                                            admission=self.admission, limiter=self.limiter, tags=tags)
+
+            # Emit signal to indicate download completion
+            self.download_complete.emit(new_video_name)
+        except DownloadError as e:
+            print(f"Error downloading video '{self.song_name}': {str(e)}")
         except Exception as e:
             # Print the exception traceback for debugging
             import traceback
@@ -50,6 +58,11 @@ class DownloadManager(QObject):
         self.downloaded_videos = 0
         self.json_file_path = ""
         self.download_directory = ""
+        self.audio_only = False
+        # One event loop thread shared by all downloads so connections are reused
+        self.engine = EngineThread()
+        # Shared by all threads; follows HITPLAYER_BANDWIDTH_SCHEDULE unless a limit is set
+        self.limiter = limiter_from_environment()
 
     def download_videos(self):
         try:
@@ -57,11 +70,17 @@ class DownloadManager(QObject):
                 data = json.load(file)
                 self.total_videos = len(data)
 
+            # Shared by all threads so they queue up behind one free space check
+            admission = AdmissionController(self.download_directory, quota_from_environment(),
+                                            on_pause=self.handle_download_paused,
+                                            on_resume=self.handle_download_resumed)
+
             for entry in data:
                 song_name = entry.get("name")
                 video_url = entry.get("url")
 
-                download_thread = DownloadThread(song_name, video_url, self.download_directory)
+                download_thread = DownloadThread(song_name, video_url, self.download_directory, self.engine,
+                                                 admission, self.limiter, self.audio_only)
                 download_thread.download_complete.connect(self.handle_download_complete)
                 download_thread.start()
                 self.download_threads.append(download_thread)
@@ -73,6 +92,13 @@ class DownloadManager(QObject):
             error_text = f"Error reading JSON file: {str(e)}"
             print(error_text)
 
+    def handle_download_paused(self, needed_bytes, free_bytes):
+        self.status_update.emit(f"Downloads paused: {needed_bytes // (1 << 20)} MiB needed, "
+                                f"{free_bytes // (1 << 20)} MiB free.")
+
+    def handle_download_resumed(self):
+        self.status_update.emit("Downloads resumed.")
+
     def handle_download_complete(self, video_name):
         self.downloaded_videos += 1
         self.download_complete.emit(video_name)
@@ -97,19 +123,31 @@ class UI(QWidget):
         self.select_json_button = QPushButton('Select JSON File')
         self.select_directory_button = QPushButton('Select Download Directory')
         self.download_button = QPushButton('Download Videos')
+        self.audio_only_check_box = QCheckBox('Audio only (music)')
+        self.audio_only_check_box.toggled.connect(self.update_audio_only)
 
         self.result_label = QLabel()
         self.progress_label = QLabel()
         self.status_label = QLabel()
         self.progress_bar = QProgressBar()
 
+        self.limit_label = QLabel('Bandwidth limit:')
+        self.limit_spin_box = QSpinBox()
+        self.limit_spin_box.setRange(0, 1000000)
+        self.limit_spin_box.setSuffix(' KiB/s')
+        self.limit_spin_box.setSpecialValueText('Schedule / unlimited')
+        self.limit_spin_box.valueChanged.connect(self.update_bandwidth_limit)
+
         self.layout.addWidget(self.select_json_button)
         self.layout.addWidget(self.select_directory_button)
+        self.layout.addWidget(self.audio_only_check_box)
         self.layout.addWidget(self.download_button)
         self.layout.addWidget(self.result_label)
         self.layout.addWidget(self.progress_label)
         self.layout.addWidget(self.status_label)
         self.layout.addWidget(self.progress_bar)
+        self.layout.addWidget(self.limit_label)
+        self.layout.addWidget(self.limit_spin_box)
 
         self.setLayout(self.layout)
         self.setGeometry(300, 300, 400, 200)
@@ -153,6 +191,17 @@ class UI(QWidget):
         # Download videos using the selected JSON file and download directory
         self.download_manager.download_videos()
 
+    def update_audio_only(self, checked):
+        self.download_manager.audio_only = checked
+        self.download_button.setText('Download Audio' if checked else 'Download Videos')
+
+    def update_bandwidth_limit(self, kib_per_second):
+        # Applies to downloads already running, from their next chunk on
+        if kib_per_second:
+            self.download_manager.limiter.set_rate(kib_per_second * 1024)
+        else:
+            self.download_manager.limiter.follow_schedule()
+
     def update_result_label(self, video_name):
         print(f"Video '{video_name}' downloaded successfully!")
 
@@ -0,0 +1,79 @@
+"""Run the downloaders against a local YouTube stand-in.
+
+pytube.YouTube is replaced by a fake whose streams point at a local server
+(see standins.py), so download_video, JobManager and the transfer code all run
+unchanged without touching the network. Each configuration downloads the same
+set of videos into a fresh directory. Prints one JSON object with timings.
+
+    python benchmarks/bench_downloads.py --videos 40 --size 4194304 --workers 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hitplayer_core.download
+from hitplayer_core.engine import EngineThread
+from hitplayer_core.jobs import JobManager
+from hitplayer_core.throttle import TokenBucket
+from standins import VideoServer, fake_youtube, make_videos
+
+
+def run_batch(urls, workers, engine=None, limiter=None):
+    with tempfile.TemporaryDirectory() as out_dir:
+        def download(url, audio_only):
+            return hitplayer_core.download.download_video(url, out_dir, engine=engine, limiter=limiter)
+
+        manager = JobManager(download, workers=workers)
+        start = time.perf_counter()
+        manager.add(urls)
+        counts = manager.wait()
+        elapsed = time.perf_counter() - start
+        manager.shutdown()
+        if counts["failed"]:
+            raise RuntimeError(f"{counts['failed']} of {len(urls)} downloads failed")
+        downloaded = sum(os.path.getsize(os.path.join(out_dir, name)) for name in os.listdir(out_dir))
+    return elapsed, downloaded
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=40)
+    parser.add_argument("--size", type=int, default=4 * 1024 * 1024, help="bytes per video")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--limit", type=int, default=None,
+                        help="also run with a shared TokenBucket at this many bytes per second")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as serve_dir:
+        ids = make_videos(serve_dir, args.videos, args.size)
+        server = VideoServer(serve_dir).start()
+        hitplayer_core.download.YouTube = fake_youtube(server)
+        urls = [f"https://www.youtube.com/watch?v={video_id}" for video_id in ids]
+
+        results = {"videos": args.videos, "bytes": args.videos * args.size, "workers": args.workers}
+        results["pytube_seconds"], downloaded = run_batch(urls, args.workers)
+        engine = EngineThread(concurrency=args.workers)
+        results["engine_seconds"], _ = run_batch(urls, args.workers, engine=engine)
+        engine.stop()
+        if args.limit:
+            results["limit"] = args.limit
+            results["limited_seconds"], _ = run_batch(urls, args.workers, limiter=TokenBucket(args.limit))
+        server.stop()
+
+    if downloaded != results["bytes"]:
+        raise RuntimeError(f"downloaded {downloaded} bytes, expected {results['bytes']}")
+    results["pytube_mib_per_second"] = round(results["bytes"] / (1 << 20) / results["pytube_seconds"], 1)
+    results["engine_mib_per_second"] = round(results["bytes"] / (1 << 20) / results["engine_seconds"], 1)
+    for key in ("pytube_seconds", "engine_seconds", "limited_seconds"):
+        if key in results:
+            results[key] = round(results[key], 3)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
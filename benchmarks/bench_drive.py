@@ -0,0 +1,66 @@
+"""Time the Google Drive listings against a fake Drive server.
+
+Builds a real googleapiclient Drive v3 service pointed at a local server that
+answers files.list with paginated folders and videos (see standins.py), then
+times GoogleDriveFolderCreator.get_all_folders and get_videos_from_folder.
+Prints one JSON object with timings.
+
+    python benchmarks/bench_drive.py --folders 2000 --videos 500 --page-size 100
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from standins import DriveServer, drive_service
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        # get_videos_from_folder prints every response; keep stdout for the results
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = func()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples), 4), result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--folders", type=int, default=1000)
+    parser.add_argument("--videos", type=int, default=100)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    from googledriveapi import GoogleDriveFolderCreator
+
+    server = DriveServer(args.folders, args.videos, args.page_size).start()
+    # The listing methods only use drive_service, so skip the window and OAuth flow
+    creator = SimpleNamespace(drive_service=drive_service(server))
+
+    folders_seconds, folders = timed(lambda: GoogleDriveFolderCreator.get_all_folders(creator), args.repeat)
+    videos_seconds, videos = timed(lambda: GoogleDriveFolderCreator.get_videos_from_folder(creator, "folder0"),
+                                   args.repeat)
+    server.stop()
+
+    print(json.dumps({
+        "folders": len(folders),
+        "videos": len(videos),
+        "page_size": args.page_size,
+        "folder_pages": -(-args.folders // args.page_size),
+        "get_all_folders_seconds": folders_seconds,
+        "get_videos_from_folder_seconds": videos_seconds,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Compare the pooled asyncio engine with one connection per download.
+
+Serves a directory of small and large files from a local keep-alive HTTP server
+and downloads all of them twice: with urllib (a new connection per file, like
+pytube) and with the AsyncDownloadEngine. Prints one JSON object with timings.
+
+    python benchmarks/bench_engine.py --small 500 --large 4
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hitplayer_core.engine import AsyncDownloadEngine
+
+
+class KeepAliveHandler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_files(directory, small, small_size, large, large_size):
+    names = []
+    for i in range(small):
+        names.append(f"small{i}.bin")
+        with open(os.path.join(directory, names[-1]), "wb") as f:
+            f.write(os.urandom(small_size))
+    for i in range(large):
+        names.append(f"large{i}.bin")
+        with open(os.path.join(directory, names[-1]), "wb") as f:
+            f.write(os.urandom(large_size))
+    return names
+
+
+def fetch_urllib(url, path):
+    with urllib.request.urlopen(url) as response, open(path, "wb") as f:
+        while True:
+            data = response.read(1 << 20)
+            if not data:
+                break
+            f.write(data)
+
+
+def bench_urllib(base, names, out_dir, workers):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(lambda name: fetch_urllib(base + name, os.path.join(out_dir, name)), names))
+    return time.perf_counter() - start
+
+
+def bench_engine(base, names, out_dir, workers):
+    async def run():
+        engine = AsyncDownloadEngine(concurrency=workers, per_host=workers)
+        start = time.perf_counter()
+        results = await engine.fetch_many([(base + name, os.path.join(out_dir, name)) for name in names])
+        elapsed = time.perf_counter() - start
+        engine.close()
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            raise errors[0]
+        return elapsed, engine.pool.opened
+
+    return asyncio.run(run())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--small", type=int, default=500)
+    parser.add_argument("--small-size", type=int, default=64 * 1024)
+    parser.add_argument("--large", type=int, default=4)
+    parser.add_argument("--large-size", type=int, default=64 * 1024 * 1024)
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as serve_dir, tempfile.TemporaryDirectory() as out_dir:
+        names = make_files(serve_dir, args.small, args.small_size, args.large, args.large_size)
+        server = ThreadingHTTPServer(("127.0.0.1", 0), partial(KeepAliveHandler, directory=serve_dir))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{server.server_address[1]}/"
+
+        total_bytes = args.small * args.small_size + args.large * args.large_size
+        urllib_time = bench_urllib(base, names, out_dir, args.workers)
+        engine_time, connections = bench_engine(base, names, out_dir, args.workers)
+        server.shutdown()
+
+    print(json.dumps({
+        "files": len(names),
+        "bytes": total_bytes,
+        "urllib_seconds": round(urllib_time, 3),
+        "engine_seconds": round(engine_time, 3),
+        "engine_connections": connections,
+        "speedup": round(urllib_time / engine_time, 2),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""First-frame latency before and after the faststart rewrite.
+
+Generates synthetic mp4 files with the moov atom at the end, then measures how
+long a streaming reader (no seeking, like progressive HTTP or a cold network
+mount) needs to get the moov atom and the first media chunk. The same files are
+rewritten with hitplayer_core.mp4.make_faststart and measured again. The page
+cache is dropped for each file before every read when the OS allows it.
+
+    python benchmarks/bench_faststart.py --files 5 --size 200M
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hitplayer_core.admission import parse_size
+from hitplayer_core.mp4 import analyze, make_faststart
+
+CHUNK_SIZE = 256 * 1024
+READ_BLOCK = 64 * 1024
+
+
+def box(type, payload):
+    return struct.pack('>I4s', 8 + len(payload), type) + payload
+
+
+def write_moov_at_end(path, size):
+    ftyp = box(b'ftyp', b'isom\x00\x00\x02\x00isomiso2mp41')
+    chunks = max(1, size // CHUNK_SIZE)
+    mdat_header = struct.pack('>I4s', 8 + chunks * CHUNK_SIZE, b'mdat')
+    offsets = [len(ftyp) + len(mdat_header) + i * CHUNK_SIZE for i in range(chunks)]
+    stco = box(b'stco', struct.pack('>II', 0, chunks) + b''.join(struct.pack('>I', o) for o in offsets))
+    moov = box(b'moov', box(b'trak', box(b'mdia', box(b'minf', box(b'stbl', stco)))))
+    with open(path, 'wb') as f:
+        f.write(ftyp)
+        f.write(mdat_header)
+        for i in range(chunks):
+            f.write(struct.pack('>I', i) + os.urandom(CHUNK_SIZE - 4))
+        f.write(moov)
+
+
+def drop_cache(path):
+    if hasattr(os, 'posix_fadvise'):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def time_to_first_chunk(path):
+    """Read sequentially until moov and the first media chunk are both in hand."""
+    layout = analyze(path)
+    with open(path, 'rb') as f:
+        f.seek(layout["moov_offset"])
+        stco_payload = f.read(layout["moov_size"])
+    first_chunk = struct.unpack('>I', stco_payload[stco_payload.index(b'stco') + 12:][:4])[0]
+    needed = max(layout["moov_offset"] + layout["moov_size"], first_chunk + CHUNK_SIZE)
+
+    drop_cache(path)
+    start = time.perf_counter()
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        done = 0
+        while done < needed:
+            block = os.read(fd, READ_BLOCK)
+            if not block:
+                break
+            done += len(block)
+    finally:
+        os.close(fd)
+    return time.perf_counter() - start, done
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=5)
+    parser.add_argument("--size", type=parse_size, default=parse_size("100M"))
+    parser.add_argument("--dir", default=None, help="where to create test files (default: a temp dir)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        paths = [os.path.join(directory, f"clip{i}.mp4") for i in range(args.files)]
+        for path in paths:
+            write_moov_at_end(path, args.size)
+
+        before = [time_to_first_chunk(path) for path in paths]
+        rewrite_start = time.perf_counter()
+        for path in paths:
+            make_faststart(path)
+        rewrite_time = time.perf_counter() - rewrite_start
+        after = [time_to_first_chunk(path) for path in paths]
+        assert all(analyze(path)["faststart"] for path in paths)
+
+    print(json.dumps({
+        "files": args.files,
+        "file_size": args.size,
+        "before_seconds": round(sum(t for t, _ in before) / len(before), 4),
+        "before_bytes_read": before[0][1],
+        "after_seconds": round(sum(t for t, _ in after) / len(after), 4),
+        "after_bytes_read": after[0][1],
+        "rewrite_seconds_per_file": round(rewrite_time / len(paths), 3),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Time the video list rebuilds in HitPlayer on a synthetic library.
+
+Generates a library of empty video files (plus some non-video noise) spread
+over one or more roots, opens a VideoWindow on the offscreen Qt platform and
+times scan_roots, updateVideoList and refreshVideoPlayer. Prints one JSON
+object with timings.
+
+    python benchmarks/bench_library.py --videos 20000 --roots 2 --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hitplayer_core.library import scan_roots
+
+
+def make_library(base, videos, roots, subdirectories, noise):
+    paths = []
+    for r in range(roots):
+        paths.append(os.path.join(base, f"root{r}"))
+        os.makedirs(paths[-1])
+    extensions = (".mp4", ".mkv", ".webm", ".avi")
+    for i in range(videos):
+        directory = paths[i % len(paths)]
+        if subdirectories:
+            directory = os.path.join(directory, f"season{i % subdirectories}")
+            os.makedirs(directory, exist_ok=True)
+        open(os.path.join(directory, f"Video {i:06d}{extensions[i % len(extensions)]}"), "w").close()
+    for i in range(noise):
+        open(os.path.join(paths[i % len(paths)], f"notes{i}.txt"), "w").close()
+    return paths
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return round(statistics.median(samples), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=5000)
+    parser.add_argument("--roots", type=int, default=1)
+    parser.add_argument("--subdirectories", type=int, default=0,
+                        help="spread videos over this many subdirectories per root (scanned recursively)")
+    parser.add_argument("--noise", type=int, default=500, help="non-video files mixed into the library")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    # Benchmarks never need a screen; HitPlayer keeps a platform set before import
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    import HitPlayer
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication(sys.argv[:1])
+
+    with tempfile.TemporaryDirectory() as base:
+        roots = make_library(base, args.videos, args.roots, args.subdirectories, args.noise)
+        recursive = args.subdirectories > 0
+
+        window = HitPlayer.VideoWindow()
+        window.video_directory = roots[0]
+        window.video_directories = roots
+        window.scanSubdirectoriesAction.setChecked(recursive)
+
+        scan_seconds = timed(lambda: scan_roots(roots, recursive), args.repeat)
+        update_seconds = timed(window.updateVideoList, args.repeat)
+        refresh_seconds = timed(window.refreshVideoPlayer, args.repeat)
+        listed = window.videoListWidget.count()
+        window.close()
+    app.quit()
+
+    print(json.dumps({
+        "videos": args.videos,
+        "listed": listed,
+        "roots": args.roots,
+        "recursive": recursive,
+        "scan_seconds": scan_seconds,
+        "update_video_list_seconds": update_seconds,
+        "refresh_video_player_seconds": refresh_seconds,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
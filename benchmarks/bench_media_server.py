@@ -0,0 +1,85 @@
+"""Throughput of the media server under concurrent range readers.
+
+Starts a MediaServer over a temp directory with a few large files, then runs
+keep-alive clients that each fetch random byte ranges, the way players seek
+and buffer. Runs once with sendfile and once with the mmap fallback and prints
+the results as JSON.
+
+    python benchmarks/bench_media_server.py --clients 16 --requests 200
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hitplayer_core.admission import parse_size
+from hitplayer_core.server import MediaServer
+
+
+def reader(port, names, file_size, range_size, requests, seed):
+    rng = random.Random(seed)
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    received = 0
+    for _ in range(requests):
+        start = rng.randrange(0, file_size - range_size)
+        connection.request("GET", "/media/" + rng.choice(names),
+                           headers={"Range": f"bytes={start}-{start + range_size - 1}"})
+        response = connection.getresponse()
+        body = response.read()
+        if response.status != 206 or len(body) != range_size:
+            raise RuntimeError(f"Bad response {response.status} with {len(body)} bytes")
+        received += len(body)
+    connection.close()
+    return received
+
+
+def run(directory, names, args, use_sendfile):
+    server = MediaServer(directory, port=0, use_sendfile=use_sendfile)
+    server.start()
+    port = server.server_address[1]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        received = sum(pool.map(lambda seed: reader(port, names, args.file_size, args.range_size, args.requests, seed),
+                                range(args.clients)))
+    elapsed = time.perf_counter() - start
+    server.stop()
+    return {
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(args.clients * args.requests / elapsed, 1),
+        "megabytes_per_second": round(received / elapsed / (1 << 20), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--files", type=int, default=4)
+    parser.add_argument("--file-size", type=parse_size, default=parse_size("64M"))
+    parser.add_argument("--range-size", type=parse_size, default=parse_size("1M"))
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=100, help="range requests per client")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        names = []
+        for i in range(args.files):
+            names.append(f"video{i}.mp4")
+            with open(os.path.join(directory, names[-1]), "wb") as f:
+                f.write(os.urandom(args.file_size))
+
+        results = {"clients": args.clients, "range_size": args.range_size}
+        if hasattr(os, "sendfile"):
+            results["sendfile"] = run(directory, names, args, use_sendfile=True)
+        results["mmap"] = run(directory, names, args, use_sendfile=False)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""Measure VideoWindow playback handling with a simulated media player.
+
+Runs HitPlayer on the offscreen Qt platform with FakeMediaPlayer (see
+fakeplayer.py), so no video is decoded and simulated time passes as fast as
+the window can handle the player's signals. Measures autoplay transitions,
+slider and timeline updates, and list rebuilds. Event counts are identical on
+every run; only the *_seconds values depend on the machine. Prints one JSON
+object.
+
+    python benchmarks/bench_playback.py --videos 2000 --transitions 200
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fakeplayer import FakeMediaPlayer, SimulatedClock
+
+
+def make_window(HitPlayer, directory, player):
+    window = HitPlayer.VideoWindow(media_player=player)
+    window.video_directory = directory
+    window.video_directories = [directory]
+    window.updateVideoList()
+    return window
+
+
+def count_signal(signal, wanted=None):
+    counter = [0]
+
+    def count(value):
+        if wanted is None or value == wanted:
+            counter[0] += 1
+
+    signal.connect(count)
+    return counter
+
+
+def bench_autoplay(HitPlayer, directory, transitions, duration):
+    from PyQt5.QtMultimedia import QMediaPlayer
+
+    clock = SimulatedClock()
+    player = FakeMediaPlayer(clock, duration=duration)
+    window = make_window(HitPlayer, directory, player)
+    loads = count_signal(player.mediaStatusChanged, QMediaPlayer.LoadingMedia)
+
+    start = time.perf_counter()
+    window.toggleAutoPlay()
+    # Each video takes its load delay plus its duration
+    clock.advance(transitions * (duration + player.load_delay))
+    elapsed = time.perf_counter() - start
+    window.close()
+    window.prefetcher.stop()
+    return {
+        "autoplay_transitions": loads[0] - 1,
+        "autoplay_simulated_seconds": clock.now / 1000,
+        "autoplay_seconds": round(elapsed, 4),
+        "autoplay_per_transition_seconds": round(elapsed / max(1, loads[0] - 1), 6),
+    }
+
+
+def bench_slider(HitPlayer, directory, notify_interval, minutes):
+    clock = SimulatedClock()
+    player = FakeMediaPlayer(clock, duration=minutes * 60 * 1000 + 1, notify_interval=notify_interval)
+    window = make_window(HitPlayer, directory, player)
+    window.startVideo(window.videoListWidget.item(0))
+    clock.advance(player.load_delay)
+    updates = count_signal(player.positionChanged)
+
+    start = time.perf_counter()
+    clock.advance(minutes * 60 * 1000)
+    elapsed = time.perf_counter() - start
+    slider_value = window.positionSlider.value()
+    window.close()
+    window.prefetcher.stop()
+    return {
+        "slider_notify_interval_ms": notify_interval,
+        "slider_updates": updates[0],
+        "slider_updates_per_simulated_second": round(updates[0] / (minutes * 60), 2),
+        "slider_final_value": slider_value,
+        "slider_seconds": round(elapsed, 4),
+        "slider_per_update_seconds": round(elapsed / max(1, updates[0]), 7),
+    }
+
+
+def bench_rebuild(HitPlayer, directory, repeat):
+    window = make_window(HitPlayer, directory, FakeMediaPlayer(SimulatedClock()))
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        window.updateVideoList()
+        samples.append(time.perf_counter() - start)
+    listed = window.videoListWidget.count()
+    window.close()
+    window.prefetcher.stop()
+    return {"rebuild_listed": listed, "rebuild_seconds": round(statistics.median(samples), 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--videos", type=int, default=1000)
+    parser.add_argument("--transitions", type=int, default=100)
+    parser.add_argument("--duration", type=int, default=180000, help="simulated milliseconds per video")
+    parser.add_argument("--notify-interval", type=int, default=1000,
+                        help="milliseconds between position updates (QMediaPlayer's default is 1000)")
+    parser.add_argument("--minutes", type=int, default=60, help="simulated playback for the slider benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    os.environ["QT_QPA_PLATFORM"] = "offscreen"
+    import HitPlayer
+    from PyQt5.QtWidgets import QApplication
+
+    app = QApplication(sys.argv[:1])
+    results = {"videos": args.videos}
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(args.videos):
+            open(os.path.join(directory, f"Video {i:06d}.mp4"), "w").close()
+        results.update(bench_autoplay(HitPlayer, directory, args.transitions, args.duration))
+        results.update(bench_slider(HitPlayer, directory, args.notify_interval, args.minutes))
+        results.update(bench_rebuild(HitPlayer, directory, args.repeat))
+    app.quit()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
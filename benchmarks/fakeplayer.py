@@ -0,0 +1,186 @@
+"""A QMediaPlayer stand-in driven by a simulated clock.
+
+FakeMediaPlayer has the signals and methods VideoWindow uses, but decodes
+nothing: loading, playback and end of media happen when the SimulatedClock is
+advanced, so a test can run an hour of playback in milliseconds and get the
+same signal sequence every time.
+
+    clock = SimulatedClock()
+    window = HitPlayer.VideoWindow(media_player=FakeMediaPlayer(clock))
+    clock.advance(60 * 60 * 1000)
+"""
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtMultimedia import QMediaPlayer
+
+
+class SimulatedClock:
+    def __init__(self):
+        self.now = 0  # milliseconds
+        self.players = []
+
+    def advance(self, milliseconds):
+        # Fire every player event due before the target time, in time order
+        target = self.now + milliseconds
+        while True:
+            due = [(player.next_event(), i) for i, player in enumerate(self.players)]
+            due = [(time, i) for time, i in due if time is not None and time <= target]
+            if not due:
+                break
+            time, i = min(due)
+            self.now = max(self.now, time)
+            self.players[i].fire(self.now)
+        self.now = target
+
+
+class FakeMediaPlayer(QObject):
+    stateChanged = pyqtSignal(int)
+    positionChanged = pyqtSignal('qint64')
+    durationChanged = pyqtSignal('qint64')
+    mediaStatusChanged = pyqtSignal(int)
+    error = pyqtSignal(int)
+
+    def __init__(self, clock, duration=180000, load_delay=50, notify_interval=1000, parent=None):
+        """``duration`` is milliseconds for every media, or a function of the media URL string."""
+        super(FakeMediaPlayer, self).__init__(parent)
+        self.clock = clock
+        self.duration_for = duration if callable(duration) else (lambda url: duration)
+        self.load_delay = load_delay
+        self.notify_interval = notify_interval
+        self._media = None
+        self._state = QMediaPlayer.StoppedState
+        self._status = QMediaPlayer.NoMedia
+        self._duration = 0
+        self._position = 0
+        self._loaded_at = None
+        self._started_at = None  # clock time matching self._position while playing
+        self._next_notify = None
+        clock.players.append(self)
+
+    # QMediaPlayer interface used by VideoWindow
+
+    def setVideoOutput(self, output):
+        pass
+
+    def setNotifyInterval(self, milliseconds):
+        self.notify_interval = milliseconds
+
+    def notifyInterval(self):
+        return self.notify_interval
+
+    def media(self):
+        return self._media
+
+    def setMedia(self, content):
+        self.stop()
+        self._media = content
+        self._position = 0
+        self._setDuration(0)
+        if content is None or content.isNull():
+            self._loaded_at = None
+            self._setStatus(QMediaPlayer.NoMedia)
+        else:
+            self._loaded_at = self.clock.now + self.load_delay
+            self._setStatus(QMediaPlayer.LoadingMedia)
+
+    def play(self):
+        if self._status == QMediaPlayer.NoMedia or self._state == QMediaPlayer.PlayingState:
+            return
+        if self._status == QMediaPlayer.EndOfMedia:
+            self._position = 0
+        self._setState(QMediaPlayer.PlayingState)
+        if self._status in (QMediaPlayer.LoadedMedia, QMediaPlayer.BufferedMedia, QMediaPlayer.EndOfMedia):
+            self._startRunning()
+
+    def pause(self):
+        if self._state == QMediaPlayer.PausedState or self._status == QMediaPlayer.NoMedia:
+            return
+        self._stopRunning()
+        self._setState(QMediaPlayer.PausedState)
+
+    def stop(self):
+        if self._state == QMediaPlayer.StoppedState:
+            return
+        self._stopRunning()
+        self._position = 0
+        if self._status == QMediaPlayer.BufferedMedia:
+            self._setStatus(QMediaPlayer.LoadedMedia)
+        self._setState(QMediaPlayer.StoppedState)
+        self.positionChanged.emit(0)
+
+    def state(self):
+        return self._state
+
+    def mediaStatus(self):
+        return self._status
+
+    def duration(self):
+        return self._duration
+
+    def position(self):
+        if self._started_at is not None:
+            return min(self._duration, self._position + self.clock.now - self._started_at)
+        return self._position
+
+    def setPosition(self, position):
+        position = max(0, min(position, self._duration))
+        running = self._started_at is not None
+        self._stopRunning()
+        self._position = position
+        if running:
+            self._startRunning()
+        self.positionChanged.emit(position)
+
+    def errorString(self):
+        return ""
+
+    # Simulation, called by SimulatedClock
+
+    def next_event(self):
+        if self._status == QMediaPlayer.LoadingMedia:
+            return self._loaded_at
+        if self._started_at is not None:
+            return min(self._next_notify, self._started_at + self._duration - self._position)
+        return None
+
+    def fire(self, now):
+        if self._status == QMediaPlayer.LoadingMedia:
+            # At least a millisecond, so autoplay over a list can't loop without time passing
+            self._setDuration(max(1, self.duration_for(self._media.canonicalUrl().toString())))
+            self._setStatus(QMediaPlayer.LoadedMedia)
+            if self._state == QMediaPlayer.PlayingState:
+                self._startRunning()
+            return
+        position = self.position()
+        if position >= self._duration:
+            self._started_at = None
+            self._position = self._duration
+            self.positionChanged.emit(self._duration)
+            self._setStatus(QMediaPlayer.EndOfMedia)
+            self._setState(QMediaPlayer.StoppedState)
+            return
+        self._next_notify = now + self.notify_interval
+        self.positionChanged.emit(position)
+
+    def _startRunning(self):
+        self._started_at = self.clock.now
+        self._next_notify = self.clock.now + self.notify_interval
+        self._setStatus(QMediaPlayer.BufferedMedia)
+
+    def _stopRunning(self):
+        self._position = self.position()
+        self._started_at = None
+
+    def _setState(self, state):
+        if state != self._state:
+            self._state = state
+            self.stateChanged.emit(state)
+
+    def _setStatus(self, status):
+        if status != self._status:
+            self._status = status
+            self.mediaStatusChanged.emit(status)
+
+    def _setDuration(self, duration):
+        if duration != self._duration:
+            self._duration = duration
+            self.durationChanged.emit(duration)
@@ -0,0 +1,131 @@
+"""Run every benchmark and store the results for regression tracking.
+
+Each bench_*.py script runs in its own process and prints one JSON object; the
+results are written to a single JSON file together with the git revision and
+machine details. Benchmarks whose dependencies are missing (no ffmpeg, no
+QtMultimedia, no googleapiclient) are recorded as failed and the rest still run.
+
+    python benchmarks/run.py --quick -o results/$(git rev-parse --short HEAD).json
+    python benchmarks/run.py --quick --compare results/baseline.json
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+BENCHMARK_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+
+# name: (script, quick arguments, full arguments)
+BENCHMARKS = {
+    "library": ("bench_library.py", ["--videos", "2000", "--repeat", "3"],
+                ["--videos", "50000", "--roots", "2", "--subdirectories", "20"]),
+    "playback": ("bench_playback.py", ["--videos", "500", "--transitions", "50", "--minutes", "10", "--repeat", "3"],
+                 ["--videos", "5000", "--transitions", "500", "--notify-interval", "100"]),
+    "downloads": ("bench_downloads.py", ["--videos", "16", "--size", "1048576"],
+                  ["--videos", "100", "--size", "16777216", "--limit", "33554432"]),
+    "drive": ("bench_drive.py", ["--folders", "500", "--videos", "100", "--repeat", "3"],
+              ["--folders", "10000", "--videos", "1000"]),
+    "engine": ("bench_engine.py", ["--small", "100", "--large", "1", "--large-size", "16777216"], []),
+    "faststart": ("bench_faststart.py", [], []),
+    "media_server": ("bench_media_server.py", [], []),
+}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BENCHMARK_DIRECTORY,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(script, arguments, timeout):
+    start = time.perf_counter()
+    try:
+        completed = subprocess.run([sys.executable, os.path.join(BENCHMARK_DIRECTORY, script)] + arguments,
+                                   capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"ok": False, "error": f"timed out after {timeout} seconds"}
+    wall = round(time.perf_counter() - start, 3)
+    if completed.returncode != 0:
+        # The last line of a traceback names the missing module or the failure
+        lines = completed.stderr.strip().splitlines() or ["exit code %d" % completed.returncode]
+        return {"ok": False, "error": lines[-1], "wall_seconds": wall}
+    try:
+        return {"ok": True, "result": json.loads(completed.stdout), "wall_seconds": wall}
+    except ValueError:
+        return {"ok": False, "error": "output is not JSON", "wall_seconds": wall}
+
+
+def compare(results, baseline):
+    # Lower is better for every *_seconds metric
+    rows = []
+    for name, entry in sorted(results["benchmarks"].items()):
+        old = baseline.get("benchmarks", {}).get(name)
+        if not entry["ok"] or not old or not old.get("ok"):
+            continue
+        for key, value in sorted(entry["result"].items()):
+            previous = old["result"].get(key)
+            if key.endswith("_seconds") and isinstance(value, (int, float)) and previous:
+                rows.append((f"{name}.{key}", previous, value, (value - previous) / previous * 100))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all of %s)" % ", ".join(BENCHMARKS))
+    parser.add_argument("--quick", action="store_true", help="small inputs, for a smoke run or CI")
+    parser.add_argument("-o", "--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="print the change against an earlier results file")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent slowdown reported as a regression (default: 10)")
+    parser.add_argument("--timeout", type=int, default=1800, help="seconds allowed per benchmark")
+    args = parser.parse_args()
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = {
+        "revision": git_revision(),
+        "time": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "quick": args.quick,
+        "benchmarks": {},
+    }
+    for name in args.names or BENCHMARKS:
+        script, quick_arguments, full_arguments = BENCHMARKS[name]
+        print(f"Running {name}...", file=sys.stderr)
+        entry = run_benchmark(script, quick_arguments if args.quick else full_arguments, args.timeout)
+        if not entry["ok"]:
+            print(f"  {name} failed: {entry['error']}", file=sys.stderr)
+        results["benchmarks"][name] = entry
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = 0
+        for metric, previous, value, change in compare(results, baseline):
+            flag = ""
+            if change > args.threshold:
+                flag = "  REGRESSION"
+                regressions += 1
+            print(f"{metric:50} {previous:10.4f} -> {value:10.4f} {change:+7.1f}%{flag}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
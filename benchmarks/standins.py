@@ -0,0 +1,162 @@
+"""Local stand-ins for YouTube and Google Drive used by the benchmarks.
+
+VideoServer serves generated video files the way YouTube's media hosts do,
+honouring the ``range=START-END`` query parameter that pytube and the asyncio
+engine send (a Range header works too). FakeYouTube replaces pytube.YouTube and
+offers one real pytube Stream per video pointing at that server, so the
+downloaders run their normal pytube code paths end to end.
+
+DriveServer answers the Drive v3 ``files.list`` calls made by
+googledriveapi.py with paginated folder and video listings.
+"""
+import json
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from pytube import Stream
+from pytube.monostate import Monostate
+from pytube.query import StreamQuery
+
+PROGRESSIVE_720P_ITAG = 22
+
+
+class _StandInServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, handler):
+        super().__init__(("127.0.0.1", 0), handler)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class _VideoHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        path = os.path.join(self.server.directory, os.path.basename(parts.path))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        start, end = 0, size - 1
+        query_range = parse_qs(parts.query).get("range")
+        header_range = re.match(r"bytes=(\d+)-(\d*)$", self.headers.get("Range", ""))
+        if query_range:
+            first, last = query_range[0].split("-")
+            start, end = int(first), min(int(last), size - 1)
+        elif header_range:
+            start = int(header_range.group(1))
+            end = min(int(header_range.group(2) or size - 1), size - 1)
+        length = max(0, end - start + 1)
+
+        self.send_response(206 if header_range else 200)
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(length))
+        self.end_headers()
+        with open(path, "rb") as file:
+            file.seek(start)
+            try:
+                self.wfile.write(file.read(length))
+            except (BrokenPipeError, ConnectionResetError):
+                # pytube asks for the whole file just to read Content-Length
+                self.close_connection = True
+
+
+class VideoServer(_StandInServer):
+    def __init__(self, directory):
+        super().__init__(_VideoHandler)
+        self.directory = directory
+
+
+def make_videos(directory, count, size):
+    """Write ``count`` random files of ``size`` bytes; returns their video ids."""
+    ids = []
+    for i in range(count):
+        ids.append(f"video{i:05d}")
+        with open(os.path.join(directory, ids[-1] + ".mp4"), "wb") as file:
+            file.write(os.urandom(size))
+    return ids
+
+
+def fake_youtube(server):
+    """A pytube.YouTube replacement bound to ``server``."""
+
+    class FakeYouTube:
+        def __init__(self, url):
+            video_id = parse_qs(urlsplit(url).query)["v"][0]
+            size = os.path.getsize(os.path.join(server.directory, video_id + ".mp4"))
+            self._monostate = Monostate(on_progress=None, on_complete=None, title=video_id)
+            self.streams = StreamQuery([Stream({
+                "url": f"{server.base_url}/{video_id}.mp4?sig=standin",
+                "itag": PROGRESSIVE_720P_ITAG,
+                "mimeType": 'video/mp4; codecs="avc1.64001F, mp4a.40.2"',
+                "is_otf": False,
+                "bitrate": 1500000,
+                "contentLength": str(size),
+            }, self._monostate)])
+
+        def register_on_progress_callback(self, func):
+            self._monostate.on_progress = func
+
+    return FakeYouTube
+
+
+class _DriveHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        if not parts.path.endswith("/drive/v3/files"):
+            self.send_error(404)
+            return
+        query = parse_qs(parts.query)
+        q = query.get("q", [""])[0]
+        if "in parents" in q:
+            items = self.server.videos
+        else:
+            items = self.server.folders
+        start = int(query.get("pageToken", ["0"])[0])
+        page = items[start:start + self.server.page_size]
+        body = {"files": page}
+        if start + self.server.page_size < len(items):
+            body["nextPageToken"] = str(start + self.server.page_size)
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class DriveServer(_StandInServer):
+    def __init__(self, folders, videos, page_size=100):
+        super().__init__(_DriveHandler)
+        self.folders = [{"id": f"folder{i}", "name": f"Folder {i}"} for i in range(folders)]
+        self.videos = [{"id": f"video{i}", "name": f"Video {i}.mp4"} for i in range(videos)]
+        self.page_size = page_size
+
+
+def drive_service(server):
+    """A googleapiclient Drive v3 service that talks to ``server``."""
+    from googleapiclient.discovery import build
+
+    return build("drive", "v3", developerKey="standin", static_discovery=True, cache_discovery=False,
+                 client_options={"api_endpoint": server.base_url + "/drive/v3/"})
@@ -15,8 +15,8 @@ from PyQt5.QtCore import Qt, QUrl
 from PyQt5.QtMultimedia import QMediaContent, QMediaPlayerControl, QMediaPlayer
 from PyQt5.QtGui import QIcon
 
-# Set Wayland as the platform (optional)
-os.environ["QT_QPA_PLATFORM"] = "wayland"
+# Set Wayland as the platform unless the environment already picks one
+os.environ.setdefault("QT_QPA_PLATFORM", "wayland")
 
 # Set the appropriate scope
 SCOPES = ["https://www.googleapis.com/auth/drive"]
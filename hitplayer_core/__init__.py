@@ -0,0 +1,19 @@
+"""GUI-free core shared by the Qt downloaders and the ``hitplayer-dl`` CLI.
+
+The tools run with ``python -m`` (dedup, mp4, server) are left out here and
+imported from their modules; importing them with the package would make
+runpy warn that the module was already loaded.
+"""
+
+from hitplayer_core.download import (
+    AUDIO_FILE_EXTENSIONS, MEDIA_EXTENSIONS, VIDEO_EXTENSIONS, DownloadError, download_video, expand_url, load_jobs,
+    video_file_name
+)
+from hitplayer_core.streams import DEFAULT_LADDER, Selection, StreamPolicy, mux, store_audio
+from hitplayer_core.engine import AsyncDownloadEngine, EngineThread
+from hitplayer_core.library import LibraryIndex, RootStatus, ScanResult, list_videos, scan_roots
+from hitplayer_core.admission import AdmissionController, parse_size, quota_from_environment
+from hitplayer_core.transcode import PROFILES, TranscodePool, transcode
+from hitplayer_core.prefetch import Prefetcher, predict_next
+from hitplayer_core.jobs import JobManager
+from hitplayer_core.throttle import Schedule, ScheduledBucket, TokenBucket, limiter_from_environment
@@ -0,0 +1,129 @@
+"""Disk-space-aware admission for downloads.
+
+Every download asks the controller for its stream size before writing a byte.
+When the library would exceed its quota, the least recently played videos are
+evicted; when the disk is still too full, the download waits (and with it the
+rest of the queue) until space frees up.
+"""
+import os
+import re
+import shutil
+import threading
+from collections import Counter
+
+from hitplayer_core.library import LibraryIndex
+
+DEFAULT_RESERVE = 512 * 1024 * 1024
+QUOTA_ENVIRONMENT_VARIABLE = 'HITPLAYER_LIBRARY_QUOTA'
+
+_SIZE_UNITS = {'': 1, 'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30, 'T': 1 << 40}
+
+
+def parse_size(text):
+    """Parse sizes like ``500M`` or ``2.5G`` into bytes."""
+    match = re.fullmatch(r'\s*([\d.]+)\s*([KMGT]?)i?B?\s*', text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid size: {text!r}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()])
+
+
+def quota_from_environment():
+    value = os.environ.get(QUOTA_ENVIRONMENT_VARIABLE)
+    return parse_size(value) if value else None
+
+
+class AdmissionController:
+    def __init__(self, directory, quota_bytes=None, reserve_bytes=DEFAULT_RESERVE, index=None,
+                 poll_interval=30, on_pause=None, on_resume=None, on_evict=None):
+        self.directory = directory
+        self.quota_bytes = quota_bytes
+        self.reserve_bytes = reserve_bytes
+        self.index = index or LibraryIndex(directory)
+        self.poll_interval = poll_interval
+        self.on_pause = on_pause
+        self.on_resume = on_resume
+        self.on_evict = on_evict
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.in_flight_names = Counter()  # Files being written; never evicted, counted via in_flight
+        self.paused = False
+
+    def _settled_files(self):
+        return [name for name in self.index.least_recently_used() if name not in self.in_flight_names]
+
+    def library_size(self):
+        total = 0
+        for name in self._settled_files():
+            try:
+                total += os.path.getsize(os.path.join(self.directory, name))
+            except OSError:
+                pass
+        return total
+
+    def free_space(self):
+        return shutil.disk_usage(self.directory).free
+
+    def _evict_for(self, size):
+        """Evict until ``size`` more bytes fit the quota; returns whether they do."""
+        if self.quota_bytes is None:
+            return True
+        used = self.library_size() + self.in_flight
+        for name in self._settled_files():
+            if used + size <= self.quota_bytes:
+                break
+            path = os.path.join(self.directory, name)
+            try:
+                file_size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                continue
+            used -= file_size
+            self.index.remove(name)
+            if self.on_evict is not None:
+                self.on_evict(name, file_size)
+        return used + size <= self.quota_bytes
+
+    def try_admit(self, size, name=None):
+        with self.condition:
+            if self.quota_bytes is not None and size > self.quota_bytes:
+                raise ValueError(f"Download of {size} bytes can never fit the library quota")
+            # Over quota even after evicting everything evictable: wait for running downloads
+            if not self._evict_for(size):
+                return False
+            # Bytes other downloads are still going to write count as used
+            if self.free_space() - self.in_flight - size < self.reserve_bytes:
+                return False
+            self.in_flight += size
+            if name is not None:
+                self.in_flight_names[name] += 1
+            return True
+
+    def admit(self, size, cancelled=None, name=None):
+        """Block until ``size`` bytes may be downloaded; returns False if cancelled.
+
+        ``name`` is the file the download writes; it is protected from eviction until released.
+        """
+        with self.condition:
+            while not self.try_admit(size, name):
+                if not self.paused:
+                    self.paused = True
+                    if self.on_pause is not None:
+                        self.on_pause(size, self.free_space())
+                if cancelled is not None and cancelled():
+                    return False
+                self.condition.wait(self.poll_interval)
+            if self.paused:
+                self.paused = False
+                if self.on_resume is not None:
+                    self.on_resume()
+            return True
+
+    def release(self, size, name=None):
+        """Call when an admitted download has finished or failed."""
+        with self.condition:
+            self.in_flight = max(0, self.in_flight - size)
+            if name is not None:
+                self.in_flight_names[name] -= 1
+                if self.in_flight_names[name] <= 0:
+                    del self.in_flight_names[name]
+            self.condition.notify_all()
@@ -0,0 +1,194 @@
+"""Headless batch downloader.
+
+Progress is written to stdout as one JSON object per line, so the output can be
+piped into other tools. Job state is kept in the download directory, so running
+the same command again after a crash resumes where it stopped. Exit codes:
+
+    0   every video downloaded
+    1   some videos or sources failed
+    2   bad arguments or unreadable job file
+    3   nothing downloaded and something failed
+    130 interrupted
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+from hitplayer_core.admission import DEFAULT_RESERVE, AdmissionController, parse_size
+from hitplayer_core.download import AUDIO_FILE_EXTENSIONS, download_video, load_jobs
+from hitplayer_core.engine import EngineThread
+from hitplayer_core.jobs import DONE, FAILED, STATE_FILE_NAME, JobManager
+from hitplayer_core.streams import DEFAULT_LADDER, StreamPolicy
+from hitplayer_core.throttle import Schedule, ScheduledBucket, TokenBucket
+from hitplayer_core.transcode import PROFILES, TranscodePool
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_USAGE = 2
+EXIT_FAILED = 3
+EXIT_INTERRUPTED = 130
+
+
+class ProgressPrinter:
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.lock = threading.Lock()
+
+    def emit(self, event, **fields):
+        fields = dict(event=event, time=round(time.time(), 3), **fields)
+        line = json.dumps(fields)
+        with self.lock:
+            self.stream.write(line + "\n")
+            self.stream.flush()
+
+
+def read_sources(sources):
+    # Job files list URLs; anything else is taken as a playlist, channel or video URL
+    urls = []
+    for source in sources:
+        if os.path.isfile(source):
+            urls.extend(job["url"] for job in load_jobs(source))
+        else:
+            urls.append(source)
+    return urls
+
+
+def run_job(url, policy, args, printer, engine=None, admission=None, limiter=None, transcode_pool=None,
+            cancel=None):
+    last_percent = [-1]
+
+    def progress(done, total):
+        percent = int(done * 100 / total) if total else 0
+        # Only report whole percent steps to keep the output readable
+        if percent != last_percent[0]:
+            last_percent[0] = percent
+            printer.emit("progress", url=url, bytes=done, total=total, percent=percent)
+
+    file_name = download_video(url, args.output, policy, on_progress=progress, engine=engine,
+                               admission=admission, limiter=limiter, cancel=cancel)
+    path = os.path.join(args.output, file_name)
+
+    # Audio downloads are already stored compactly; the transcode profiles are for video
+    if transcode_pool is not None and not file_name.endswith(AUDIO_FILE_EXTENSIONS):
+        printer.emit("downloaded", url=url, file=path)
+
+        def on_transcode_progress(percent):
+            printer.emit("transcode", url=url, file=path, percent=percent)
+
+        # Block this worker so the pool's queue bound also limits downloads ahead of it
+        path = transcode_pool.submit(path, args.transcode, on_transcode_progress).result()
+    return path
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="hitplayer-dl", description="Download YouTube videos without a GUI.")
+    parser.add_argument("sources", nargs="+",
+                        help="job files (JSON list or NDJSON), playlist, channel or video URLs")
+    parser.add_argument("-o", "--output", default=".", help="download directory (default: current directory)")
+    parser.add_argument("-j", "--workers", type=int, default=4, help="number of parallel downloads (default: 4)")
+    parser.add_argument("-r", "--resolution", dest="ladder", default=",".join(DEFAULT_LADDER),
+                        help="comma separated resolutions to try in order (default: %(default)s)")
+    parser.add_argument("--max-size", type=parse_size, default=None, help="skip streams larger than this, like 300M")
+    parser.add_argument("--max-bitrate", type=parse_size, default=None,
+                        help="skip streams above this many bits per second, like 2M")
+    parser.add_argument("--audio-only", action="store_true", help="download only the best audio stream")
+    parser.add_argument("--adaptive", action="store_true",
+                        help="allow separate video and audio streams, muxed with ffmpeg")
+    parser.add_argument("--transcode", choices=sorted(PROFILES), default=None,
+                        help="remux or re-encode every finished download with this profile")
+    parser.add_argument("--transcode-workers", type=int, default=None,
+                        help="parallel ffmpeg processes (default: CPU count - 1)")
+    parser.add_argument("--engine", choices=("pytube", "async"), default="pytube",
+                        help="transfer with pytube or the pooled asyncio engine (default: pytube)")
+    parser.add_argument("--quota", type=parse_size, default=None,
+                        help="library size limit like 200G; least recently played videos are evicted")
+    parser.add_argument("--reserve", type=parse_size, default=DEFAULT_RESERVE,
+                        help="free space to always keep on the disk (default: 512M)")
+    parser.add_argument("--limit", type=parse_size, default=None,
+                        help="total download rate in bytes per second across all workers, like 5M")
+    parser.add_argument("--schedule", type=Schedule.parse, default=None,
+                        help="time-of-day rates like 'mon-fri 09:00-18:00=512K, *=unlimited'; "
+                             "--limit overrides it")
+    parser.add_argument("--state", default=None,
+                        help=f"job state file for resuming (default: OUTPUT/{STATE_FILE_NAME})")
+    parser.add_argument("--retry-failed", action="store_true", help="retry videos that failed in an earlier run")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    printer = ProgressPrinter()
+
+    if args.workers < 1:
+        printer.emit("error", error="--workers must be at least 1")
+        return EXIT_USAGE
+    if not os.path.isdir(args.output):
+        printer.emit("error", error=f"Download directory does not exist: {args.output}")
+        return EXIT_USAGE
+
+    # Keyed by the audio_only flag each video keeps in the job state
+    policies = {audio_only: StreamPolicy(args.ladder.split(","), args.max_size, args.max_bitrate, audio_only,
+                                         args.adaptive)
+                for audio_only in (False, True)}
+
+    try:
+        sources = read_sources(args.sources)
+    except Exception as e:
+        printer.emit("error", error=f"Could not read jobs: {e}")
+        return EXIT_USAGE
+
+    # Worker threads resolve stream metadata; with the async engine they all
+    # hand the actual transfer to one event loop sharing pooled connections
+    engine = EngineThread(concurrency=args.workers) if args.engine == "async" else None
+    admission = AdmissionController(
+        args.output, args.quota, args.reserve,
+        on_pause=lambda size, free: printer.emit("paused", needed=size, free=free),
+        on_resume=lambda: printer.emit("resumed"),
+        on_evict=lambda name, size: printer.emit("evicted", file=name, bytes=size),
+    )
+    transcode_pool = TranscodePool(args.transcode_workers) if args.transcode else None
+
+    # One bucket for all workers, charged at every chunk write
+    limiter = ScheduledBucket(args.schedule) if args.schedule else TokenBucket()
+    if args.limit is not None:
+        limiter.set_rate(args.limit)
+
+    def download(url, audio_only):
+        return run_job(url, policies[audio_only], args, printer, engine, admission, limiter, transcode_pool,
+                       manager.cancel)
+
+    manager = JobManager(download, args.state or os.path.join(args.output, STATE_FILE_NAME), args.workers,
+                         on_event=printer.emit)
+    try:
+        manager.resume(retry_failed=args.retry_failed)
+        manager.add(sources, args.audio_only)
+        counts = manager.wait()
+        manager.shutdown()
+    except KeyboardInterrupt:
+        # Running downloads stop at their next chunk; workers waiting on a queued transcode are let go
+        manager.cancel.set()
+        if transcode_pool is not None:
+            transcode_pool.shutdown(wait=False, cancel=True)
+        manager.shutdown(cancel=True)
+        printer.emit("summary", interrupted=True, **manager.counts())
+        return EXIT_INTERRUPTED
+    finally:
+        if engine is not None:
+            engine.stop()
+        if transcode_pool is not None:
+            transcode_pool.shutdown()
+
+    printer.emit("summary", **counts)
+    # A playlist or channel that could not be expanded counts as a failure too
+    if counts[FAILED] == 0 and counts["sources_failed"] == 0:
+        return EXIT_OK
+    if counts[DONE] == 0:
+        return EXIT_FAILED
+    return EXIT_PARTIAL
+
+
+if __name__ == '__main__':
+    sys.exit(main())
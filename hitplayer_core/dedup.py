@@ -0,0 +1,176 @@
+"""Find duplicate media files by content.
+
+Files are only hashed when another file has the same size, and then only their
+first and last MiB. A full hash is computed just for files whose partial hashes
+collide, so most of a large library is never read.
+
+    python -m hitplayer_core.dedup ~/Videos --action link
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import sys
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from hitplayer_core.download import MEDIA_EXTENSIONS
+from hitplayer_core.library import is_partial
+
+PARTIAL_SIZE = 1 << 20
+FULL_HASH_BLOCK = 8 << 20
+
+
+def iter_media_files(directory, extensions=MEDIA_EXTENSIONS, recursive=True):
+    for entry in os.scandir(directory):
+        if entry.is_dir(follow_symlinks=False):
+            if recursive:
+                yield from iter_media_files(entry.path, extensions, recursive)
+        elif entry.is_file(follow_symlinks=False) and entry.name.lower().endswith(extensions):
+            # Files still being downloaded or muxed must not be linked or deleted
+            if not is_partial(entry.name):
+                yield entry.path
+
+
+def partial_hash(path):
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        digest = hashlib.blake2b(digest_size=16)
+        if len(data) <= 2 * PARTIAL_SIZE:
+            digest.update(data)
+        else:
+            digest.update(data[:PARTIAL_SIZE])
+            digest.update(data[-PARTIAL_SIZE:])
+    return digest.hexdigest()
+
+
+def full_hash(path):
+    with open(path, 'rb') as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        digest = hashlib.blake2b(digest_size=32)
+        view = memoryview(data)
+        for offset in range(0, len(data), FULL_HASH_BLOCK):
+            digest.update(view[offset:offset + FULL_HASH_BLOCK])
+        view.release()
+    return digest.hexdigest()
+
+
+def _hash_groups(groups, hash_function, executor):
+    paths = [path for group in groups for path in group]
+    hashes = dict(zip(paths, executor.map(hash_function, paths, chunksize=16)))
+    refined = []
+    for group in groups:
+        by_hash = defaultdict(list)
+        for path in group:
+            by_hash[hashes[path]].append(path)
+        refined.extend(paths for paths in by_hash.values() if len(paths) > 1)
+    return refined
+
+
+def find_duplicates(paths, workers=None):
+    """Return groups of paths with identical content, oldest file first."""
+    by_size = defaultdict(list)
+    seen_inodes = set()
+    stats = {}
+    for path in paths:
+        stat = os.stat(path)
+        # Hard links to one inode are already deduplicated
+        if stat.st_size == 0 or (stat.st_dev, stat.st_ino) in seen_inodes:
+            continue
+        seen_inodes.add((stat.st_dev, stat.st_ino))
+        stats[path] = stat
+        by_size[stat.st_size].append(path)
+
+    groups = [group for group in by_size.values() if len(group) > 1]
+    if not groups:
+        return []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        groups = _hash_groups(groups, partial_hash, executor)
+        # Small files were hashed completely by partial_hash already
+        small = [group for group in groups if stats[group[0]].st_size <= 2 * PARTIAL_SIZE]
+        large = [group for group in groups if stats[group[0]].st_size > 2 * PARTIAL_SIZE]
+        if large:
+            large = _hash_groups(large, full_hash, executor)
+
+    return [sorted(group, key=lambda path: (stats[path].st_mtime, path)) for group in small + large]
+
+
+def link_duplicates(groups, errors=None):
+    """Replace every copy with a hard link to the first file of its group on the same device.
+
+    Files that could not be linked are appended to ``errors`` as {"file", "error"} dicts.
+    """
+    saved = 0
+    for group in groups:
+        # Hard links can't cross file systems, so every device keeps one real copy
+        originals = {}
+        for path in group:
+            try:
+                device = os.stat(path).st_dev
+            except OSError as e:
+                _record(errors, path, e)
+                continue
+            original = originals.setdefault(device, path)
+            if original == path:
+                continue
+            temp_path = path + '.dedup'
+            try:
+                os.link(original, temp_path)
+                # Atomic swap, so a crash never leaves the copy missing
+                os.replace(temp_path, path)
+            except OSError as e:
+                if os.path.lexists(temp_path):
+                    os.remove(temp_path)
+                _record(errors, path, e)
+                continue
+            saved += os.path.getsize(original)
+    return saved
+
+
+def delete_duplicates(groups, errors=None):
+    """Delete every copy but the first file of its group."""
+    saved = 0
+    for original, *copies in groups:
+        for copy in copies:
+            try:
+                size = os.path.getsize(copy)
+                os.remove(copy)
+            except OSError as e:
+                _record(errors, copy, e)
+                continue
+            saved += size
+    return saved
+
+
+def _record(errors, path, error):
+    if errors is not None:
+        errors.append({"file": path, "error": str(error)})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m hitplayer_core.dedup",
+                                     description="Report, hard-link or delete duplicate media files.")
+    parser.add_argument("directories", nargs="+")
+    parser.add_argument("--action", choices=("report", "link", "delete"), default="report")
+    parser.add_argument("--workers", type=int, default=None, help="hashing processes (default: CPU count)")
+    parser.add_argument("--no-recursive", dest="recursive", action="store_false")
+    args = parser.parse_args(argv)
+
+    paths = [path for directory in args.directories for path in iter_media_files(directory, recursive=args.recursive)]
+    groups = find_duplicates(paths, args.workers)
+    wasted = sum(os.path.getsize(group[0]) * (len(group) - 1) for group in groups)
+
+    saved = 0
+    errors = []
+    if args.action == "link":
+        saved = link_duplicates(groups, errors)
+    elif args.action == "delete":
+        saved = delete_duplicates(groups, errors)
+
+    print(json.dumps({"files": len(paths), "groups": groups, "wasted_bytes": wasted,
+                      "action": args.action, "saved_bytes": saved, "errors": errors}, indent=2))
+    return 1 if errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
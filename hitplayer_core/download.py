@@ -0,0 +1,225 @@
+import json
+import os
+import shutil
+from urllib.request import Request, urlopen
+
+from pytube import Channel, Playlist, YouTube, extract, request
+from pytube.exceptions import RegexMatchError
+
+from hitplayer_core.streams import StreamPolicy, mux, store_audio
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv')
+# .m4a and .webm are what audio-only downloads are stored as
+AUDIO_FILE_EXTENSIONS = ('.m4a', '.webm', '.mp3', '.opus', '.ogg', '.flac')
+MEDIA_EXTENSIONS = VIDEO_EXTENSIONS + AUDIO_FILE_EXTENSIONS
+
+
+class DownloadError(Exception):
+    pass
+
+
+def video_file_name(title, extension='.mp4'):
+    # Same naming scheme the Qt downloaders have always used, minus path separators
+    name = title.lower().replace(' ', '').replace(os.sep, '_')
+    return name + extension
+
+
+# Throttled downloads read and charge the limiter this much at a time
+THROTTLED_BLOCK_SIZE = 64 * 1024
+REQUEST_HEADERS = {"User-Agent": "Mozilla/5.0", "accept-language": "en-US,en"}  # What pytube sends
+
+CHANNEL_MARKERS = ('/channel/', '/c/', '/user/', '/@')
+
+
+def expand_url(url):
+    # Playlist and channel URLs expand to their videos, anything else is a single video
+    if "playlist" in url.lower():
+        return list(Playlist(url).video_urls)
+    if any(marker in url for marker in CHANNEL_MARKERS):
+        return list(Channel(url).video_urls)
+    return [url]
+
+
+def video_id(url):
+    """The YouTube video id of ``url``, or the URL itself for anything else."""
+    try:
+        return extract.video_id(url)
+    except RegexMatchError:
+        return url
+
+
+def load_jobs(path):
+    """Read a job file: a JSON list like song.json, or one JSON object per line.
+
+    Every job is returned as a dict with at least a "url" key.
+    """
+    with open(path, 'r') as file:
+        text = file.read()
+
+    stripped = text.lstrip()
+    if stripped.startswith('['):
+        entries = json.loads(stripped)
+    else:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    jobs = []
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {"url": entry}
+        if not entry.get("url"):
+            raise ValueError(f"Job without url in {path}: {entry!r}")
+        jobs.append(entry)
+    return jobs
+
+
+def download_video(url, directory, policy=None, on_progress=None, engine=None, admission=None, limiter=None,
+                   tags=None, cancel=None):
+    """Download one video and return the saved file name.
+
+    ``policy`` is a streams.StreamPolicy (default: the 720p-down ladder).
+    Audio-only selections are stored with title and artist tags from YouTube;
+    ``tags`` overrides or adds to them, e.g. {"title": "Song 1"}.
+    ``on_progress`` is called as ``on_progress(bytes_done, bytes_total)``.
+    With an ``engine`` (an engine.EngineThread) the transfer goes through its
+    pooled connections instead of pytube's own requests. With an ``admission``
+    controller the download waits until the stream size fits on disk. Every
+    written chunk is charged to ``limiter`` (a throttle.TokenBucket) if given.
+    Setting ``cancel`` (a threading.Event) stops the download at its next chunk.
+    Raises DownloadError when no stream matches the policy or when cancelled.
+    """
+    yt = YouTube(url)
+    selection = (policy or StreamPolicy()).select(yt.streams)
+
+    if selection is None:
+        raise DownloadError("Video stream is not available.")
+
+    new_video_name = video_file_name(selection.title, selection.extension)
+    if selection.video is None:
+        tags = dict({"title": selection.title, "artist": yt.author}, **(tags or {}))
+    if admission is None:
+        return _download_selection(yt, selection, directory, new_video_name, on_progress, engine, limiter, tags,
+                                   cancel)
+
+    size = selection.filesize
+    if not admission.admit(size, cancel.is_set if cancel is not None else None, new_video_name):
+        raise DownloadError("Download cancelled.")
+    try:
+        return _download_selection(yt, selection, directory, new_video_name, on_progress, engine, limiter, tags,
+                                   cancel)
+    finally:
+        admission.release(size, new_video_name)
+
+
+def _download_selection(yt, selection, directory, new_video_name, on_progress, engine, limiter, tags, cancel):
+    if selection.video is None:
+        return _download_audio(yt, selection, directory, new_video_name, on_progress, engine, limiter, tags,
+                               cancel)
+    if not selection.needs_mux:
+        _download_stream(yt, selection.streams[0], directory, new_video_name, on_progress, engine, limiter,
+                         cancel)
+        return new_video_name
+
+    # Adaptive pair: fetch both halves next to the target, then mux them together
+    total = selection.filesize
+    video_part = new_video_name + ".video.mp4"
+    audio_part = new_video_name + ".audio" + selection.extension
+    video_size = selection.video.filesize
+
+    def audio_progress(done, _total):
+        on_progress(video_size + done, total)
+
+    def video_progress(done, _total):
+        on_progress(done, total)
+
+    try:
+        _download_stream(yt, selection.video, directory, video_part, on_progress and video_progress, engine,
+                         limiter, cancel)
+        _download_stream(yt, selection.audio, directory, audio_part, on_progress and audio_progress, engine,
+                         limiter, cancel)
+        mux(os.path.join(directory, video_part), os.path.join(directory, audio_part),
+            os.path.join(directory, new_video_name))
+    finally:
+        for part in (video_part, audio_part):
+            if os.path.exists(os.path.join(directory, part)):
+                os.remove(os.path.join(directory, part))
+    return new_video_name
+
+
+def _download_audio(yt, selection, directory, new_video_name, on_progress, engine, limiter, tags, cancel):
+    # Without ffmpeg the audio is kept as downloaded, just untagged
+    if shutil.which("ffmpeg") is None:
+        _download_stream(yt, selection.audio, directory, new_video_name, on_progress, engine, limiter, cancel)
+        return new_video_name
+
+    audio_part = new_video_name + ".part" + selection.extension
+    try:
+        _download_stream(yt, selection.audio, directory, audio_part, on_progress, engine, limiter, cancel)
+        store_audio(os.path.join(directory, audio_part), os.path.join(directory, new_video_name), tags)
+    finally:
+        if os.path.exists(os.path.join(directory, audio_part)):
+            os.remove(os.path.join(directory, audio_part))
+    return new_video_name
+
+
+def _download_stream(yt, stream, directory, file_name, on_progress, engine, limiter, cancel):
+    if engine is not None:
+        # Segmented (OTF) streams have no byte ranges to ask for
+        size = None if stream.is_otf else stream.filesize
+        engine.download(stream.url, os.path.join(directory, file_name), on_progress, limiter, size, cancel)
+        return
+
+    path = os.path.join(directory, file_name)
+    try:
+        if limiter is not None and not stream.is_otf:
+            _download_throttled(stream, path, on_progress, limiter, cancel)
+        else:
+            _download_with_pytube(yt, stream, directory, file_name, on_progress, limiter, cancel)
+    except BaseException:
+        # Do not leave a cut-off file under the final name for the library to pick up
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+
+def _download_with_pytube(yt, stream, directory, file_name, on_progress, limiter, cancel):
+    if on_progress is not None or limiter is not None or cancel is not None:
+        total = stream.filesize
+
+        # pytube calls this right after writing each chunk; segmented (OTF)
+        # streams are only throttled here, one segment at a time
+        def progress(chunk_stream, chunk, bytes_remaining):
+            if chunk_stream is not stream:
+                return
+            if limiter is not None and not limiter.consume(len(chunk), cancel):
+                raise DownloadError("Download cancelled.")
+            if cancel is not None and cancel.is_set():
+                raise DownloadError("Download cancelled.")
+            if on_progress is not None:
+                on_progress(total - bytes_remaining, total)
+
+        yt.register_on_progress_callback(progress)
+
+    stream.download(directory, filename=file_name)
+
+
+def _download_throttled(stream, path, on_progress, limiter, cancel):
+    # pytube reads each 9 MiB range in one go and only reports afterwards, which
+    # would let every download burst at line rate. Request the same ranges, but
+    # read them in small blocks that are paid for before they leave the socket.
+    total = stream.filesize
+    done = 0
+    with open(path, "wb") as file:
+        while done < total:
+            stop = min(done + request.default_range_size, total) - 1
+            with urlopen(Request(f"{stream.url}&range={done}-{stop}", headers=REQUEST_HEADERS)) as response:
+                while done <= stop:
+                    size = min(THROTTLED_BLOCK_SIZE, stop + 1 - done)
+                    if not limiter.consume(size, cancel) or (cancel is not None and cancel.is_set()):
+                        raise DownloadError("Download cancelled.")
+                    data = response.read(size)
+                    if not data:
+                        raise DownloadError(f"Connection closed after {done} of {total} bytes.")
+                    file.write(data)
+                    done += len(data)
+                    if on_progress is not None:
+                        on_progress(done, total)
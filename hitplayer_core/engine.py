@@ -0,0 +1,328 @@
+"""Asyncio download engine with keep-alive connection pooling.
+
+pytube opens a fresh connection for every request. For big batches of small
+clips the TCP/TLS handshakes dominate, so this engine keeps idle HTTP/1.1
+connections per host and reuses them for the next transfer. Like pytube it
+asks YouTube's media hosts for ``request.default_range_size`` pieces with a
+``range=START-END`` query parameter, since the hosts throttle one GET of a
+whole file.
+
+Qt code does not run an asyncio loop, so ``EngineThread`` runs the engine on a
+background thread and hands work over with thread-safe futures.
+"""
+import asyncio
+import concurrent.futures
+import os
+import ssl
+import threading
+from urllib.parse import urljoin, urlsplit
+
+from pytube import request
+
+from hitplayer_core.download import DownloadError
+
+BUFFER_SIZE = 1 << 20
+MAX_REDIRECTS = 5
+CANCEL_POLL = 0.25
+USER_AGENT = "Mozilla/5.0"
+
+
+class Connection:
+    def __init__(self, key, reader, writer):
+        self.key = key
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    def close(self):
+        self.writer.close()
+
+
+class ConnectionPool:
+    def __init__(self, per_host=6, buffer_size=BUFFER_SIZE):
+        self.per_host = per_host
+        self.buffer_size = buffer_size
+        self.idle = {}
+        self.slots = {}
+        self.ssl_context = ssl.create_default_context()
+        self.opened = 0
+
+    def _slots(self, key):
+        if key not in self.slots:
+            self.slots[key] = asyncio.Semaphore(self.per_host)
+        return self.slots[key]
+
+    async def acquire(self, scheme, host, port, fresh=False):
+        key = (scheme, host, port)
+        await self._slots(key).acquire()
+        idle = self.idle.get(key, [])
+        while idle and not fresh:
+            conn = idle.pop()
+            # The server may have closed an idle connection in the meantime
+            if not conn.reader.at_eof():
+                conn.reused = True
+                return conn
+            conn.close()
+        try:
+            reader, writer = await asyncio.open_connection(
+                host, port, ssl=self.ssl_context if scheme == "https" else None, limit=self.buffer_size
+            )
+        except BaseException:
+            self._slots(key).release()
+            raise
+        self.opened += 1
+        return Connection(key, reader, writer)
+
+    def release(self, conn, reusable):
+        if reusable:
+            self.idle.setdefault(conn.key, []).append(conn)
+        else:
+            conn.close()
+        self._slots(conn.key).release()
+
+    def close(self):
+        for conns in self.idle.values():
+            for conn in conns:
+                conn.close()
+        self.idle.clear()
+
+
+def _write_all(fd, data):
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+class AsyncDownloadEngine:
+    def __init__(self, concurrency=8, per_host=6, buffer_size=BUFFER_SIZE):
+        self.buffer_size = buffer_size
+        self.pool = ConnectionPool(per_host, buffer_size)
+        self.concurrency = asyncio.Semaphore(concurrency)
+
+    async def fetch(self, url, path, on_progress=None, limiter=None, size=None):
+        """Download ``url`` to ``path`` and return the number of bytes written.
+
+        With the ``size`` known the file is fetched in ranges, each one over a
+        pooled connection; without it in a single GET.
+        The body goes to ``path + '.part'`` first and is renamed when complete.
+        ``on_progress`` is called as ``on_progress(bytes_done, bytes_total)``.
+        Every chunk read is charged to ``limiter`` (a throttle.TokenBucket).
+        """
+        async with self.concurrency:
+            part_path = path + ".part"
+            fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                if size is None:
+                    await self._fetch(url, fd, None, on_progress, limiter)
+                done = 0
+                while size is not None and done < size:
+                    stop = min(done + request.default_range_size, size) - 1
+                    await self._fetch(f"{url}&range={done}-{stop}", fd, size, on_progress, limiter)
+                    done = os.lseek(fd, 0, os.SEEK_CUR)
+                    if done != stop + 1:
+                        raise DownloadError(f"Got {done} of {stop + 1} bytes after a range of {url}")
+            except BaseException:
+                os.close(fd)
+                os.remove(part_path)
+                raise
+            os.close(fd)
+            os.replace(part_path, path)
+            return os.path.getsize(path)
+
+    async def _fetch(self, url, fd, total, on_progress, limiter):
+        for _ in range(MAX_REDIRECTS + 1):
+            location = await self._fetch_once(url, fd, total, on_progress, limiter)
+            if location is None:
+                return
+            url = urljoin(url, location)
+        raise DownloadError(f"Too many redirects for {url}")
+
+    async def _fetch_once(self, url, fd, total, on_progress, limiter):
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        port = parts.port or (443 if scheme == "https" else 80)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+
+        message = (
+            f"GET {target} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            f"User-Agent: {USER_AGENT}\r\n"
+            "Accept-Encoding: identity\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode("latin-1")
+
+        conn = await self.pool.acquire(scheme, parts.hostname, port)
+        reusable = False
+        try:
+            try:
+                version, status, headers = await self._send_request(conn, message)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                if not conn.reused:
+                    raise
+                # The server closed the idle connection before at_eof() could tell.
+                # Nothing has arrived yet, so the GET is safe to repeat once on a new one.
+                self.pool.release(conn, False)
+                conn = None
+                conn = await self.pool.acquire(scheme, parts.hostname, port, fresh=True)
+                version, status, headers = await self._send_request(conn, message)
+            keep_alive = self._keep_alive(version, headers)
+
+            if status in (301, 302, 303, 307, 308) and "location" in headers:
+                await self._drain_body(conn.reader, headers)
+                reusable = keep_alive
+                return headers["location"]
+            if status >= 400:
+                await self._drain_body(conn.reader, headers)
+                reusable = keep_alive
+                raise DownloadError(f"HTTP {status} for {url}")
+
+            await self._save_body(conn.reader, headers, fd, total, on_progress, limiter)
+            reusable = keep_alive
+            return None
+        finally:
+            if conn is not None:
+                self.pool.release(conn, reusable)
+
+    async def _send_request(self, conn, message):
+        conn.writer.write(message)
+        await conn.writer.drain()
+        return await self._read_head(conn.reader)
+
+    def _keep_alive(self, version, headers):
+        # HTTP/1.0 closes after every response unless the server says otherwise
+        connection = headers.get("connection", "").lower()
+        if connection == "close" or (version == "HTTP/1.0" and connection != "keep-alive"):
+            return False
+        # Without a length or chunked framing the body ends when the server closes
+        return "content-length" in headers or headers.get("transfer-encoding", "").lower() == "chunked"
+
+    async def _read_head(self, reader):
+        head = await reader.readuntil(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        version, status = lines[0].split()[:2]
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        return version.upper(), int(status), headers
+
+    async def _iter_body(self, reader, headers):
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                if size == 0:
+                    await reader.readline()
+                    return
+                remaining = size
+                while remaining:
+                    data = await reader.read(min(remaining, self.buffer_size))
+                    if not data:
+                        raise DownloadError("Connection closed mid-chunk")
+                    remaining -= len(data)
+                    yield data
+                await reader.readline()
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining:
+                data = await reader.read(min(remaining, self.buffer_size))
+                if not data:
+                    raise DownloadError("Connection closed before the body was complete")
+                remaining -= len(data)
+                yield data
+        else:
+            while True:
+                data = await reader.read(self.buffer_size)
+                if not data:
+                    return
+                yield data
+
+    async def _drain_body(self, reader, headers):
+        async for _ in self._iter_body(reader, headers):
+            pass
+
+    async def _save_body(self, reader, headers, fd, total, on_progress, limiter):
+        # Appends to fd; done counts the earlier ranges as well
+        done = os.lseek(fd, 0, os.SEEK_CUR)
+        if total is None:
+            total = int(headers.get("content-length", 0))
+        pending = bytearray()
+        async for data in self._iter_body(reader, headers):
+            if limiter is not None:
+                await limiter.consume_async(len(data))
+            pending += data
+            done += len(data)
+            # Socket reads are small, so batch them into big writes
+            if len(pending) >= self.buffer_size:
+                _write_all(fd, pending)
+                pending.clear()
+                if on_progress is not None:
+                    on_progress(done, total)
+        if pending:
+            _write_all(fd, pending)
+        if on_progress is not None:
+            on_progress(done, total or done)
+
+    async def fetch_many(self, jobs):
+        """Run ``(url, path)`` pairs concurrently; exceptions are returned in place of sizes."""
+        return await asyncio.gather(*(self.fetch(url, path) for url, path in jobs), return_exceptions=True)
+
+    def close(self):
+        self.pool.close()
+
+
+class EngineThread(threading.Thread):
+    """Runs an AsyncDownloadEngine on its own event loop for blocking callers.
+
+    Worker threads (QThread or plain threads) call ``download`` and block until
+    the transfer is done, while all of them share one connection pool.
+    """
+
+    def __init__(self, concurrency=8, per_host=6, buffer_size=BUFFER_SIZE):
+        super().__init__(daemon=True)
+        self.loop = asyncio.new_event_loop()
+        self.engine_args = (concurrency, per_host, buffer_size)
+        self.engine = None
+        self.ready = threading.Event()
+        self.start_lock = threading.Lock()
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.engine = AsyncDownloadEngine(*self.engine_args)
+        self.ready.set()
+        self.loop.run_forever()
+        # Cancel what is still running so part files are removed and waiting callers return
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+        self.engine.close()
+        self.loop.close()
+
+    def submit(self, url, path, on_progress=None, limiter=None, size=None):
+        with self.start_lock:
+            if not self.is_alive():
+                self.start()
+        self.ready.wait()
+        return asyncio.run_coroutine_threadsafe(self.engine.fetch(url, path, on_progress, limiter, size), self.loop)
+
+    def download(self, url, path, on_progress=None, limiter=None, size=None, cancel=None):
+        """Blocking fetch; setting ``cancel`` (a threading.Event) stops it with a DownloadError."""
+        future = self.submit(url, path, on_progress, limiter, size)
+        if cancel is None:
+            return future.result()
+        while True:
+            try:
+                return future.result(CANCEL_POLL)
+            except concurrent.futures.TimeoutError:
+                if cancel.is_set():
+                    future.cancel()
+                    raise DownloadError("Download cancelled.")
+
+    def stop(self):
+        if self.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.join()
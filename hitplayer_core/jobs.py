@@ -0,0 +1,217 @@
+"""Batch ingestion of many playlists, channels and videos.
+
+A JobManager expands every source concurrently, de-duplicates videos by their
+YouTube id across all sources, and downloads them through one worker pool.
+Its state is saved to a JSON file after every
+change, so a crashed or interrupted run picks up where it stopped: finished
+videos are skipped and unfinished ones are queued again. Sources are expanded
+again every time they are added, so videos new to a playlist are picked up.
+"""
+import json
+import os
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from hitplayer_core.download import DownloadError, expand_url, video_id
+
+STATE_FILE_NAME = '.hitplayer_jobs.json'
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class JobManager:
+    def __init__(self, download, state_path=None, workers=4, on_event=None, expand=expand_url):
+        """``download(url, audio_only)`` fetches one video and returns its file.
+
+        ``on_event(event, **fields)`` is called from worker threads. ``download``
+        should stop early once the ``cancel`` event is set; see shutdown().
+        """
+        self.download = download
+        self.expand = expand
+        self.state_path = state_path
+        self.on_event = on_event
+        self.lock = threading.RLock()
+        self.idle = threading.Condition(self.lock)
+        self.outstanding = 0
+        self.expanding = set()  # Sources queued or being expanded in this process
+        self.cancel = threading.Event()
+        self.state = {"sources": {}, "videos": {}}
+        self.load()
+        self.expanders = ThreadPoolExecutor(max_workers=4, thread_name_prefix="expand")
+        self.downloaders = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="download")
+
+    def emit(self, event, **fields):
+        if self.on_event is not None:
+            self.on_event(event, **fields)
+
+    def load(self):
+        if not self.state_path or not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, 'r') as file:
+                self.state = json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Error reading job state {self.state_path}: {str(e)}")
+            return
+        # Anything that was running when the last process died starts over
+        for video in self.state["videos"].values():
+            if video["status"] == RUNNING:
+                video["status"] = PENDING
+
+    def save(self):
+        if not self.state_path:
+            return
+        with self.lock:
+            temp_path = self.state_path + '.tmp'
+            with open(temp_path, 'w') as file:
+                json.dump(self.state, file, indent=1)
+            os.replace(temp_path, self.state_path)
+
+    def resume(self, retry_failed=False):
+        """Queue every unfinished video and unexpanded source from the saved state."""
+        with self.lock:
+            for url, source in self.state["sources"].items():
+                if source["status"] != DONE:
+                    self._expand_later(url)
+            for key, video in self.state["videos"].items():
+                if video["status"] == PENDING or (retry_failed and video["status"] == FAILED):
+                    self._download_later(key)
+
+    def add(self, sources, audio_only=False):
+        """Add playlist, channel or video URLs; returns immediately.
+
+        Known sources are expanded again; their videos that are already done are skipped.
+        ``audio_only`` is saved with every new video, so resuming keeps the mode.
+        """
+        with self.lock:
+            for url in sources:
+                url = url.strip()
+                if not url or url in self.expanding:
+                    continue
+                source = self.state["sources"].setdefault(url, {"videos": 0})
+                source.update(status=PENDING, audio_only=audio_only)
+                self._expand_later(url)
+            self.save()
+
+    def _expand_later(self, url):
+        if url in self.expanding:
+            return
+        self.expanding.add(url)
+        self.outstanding += 1
+        self.expanders.submit(self._expand, url)
+
+    def _download_later(self, key):
+        self.state["videos"][key]["status"] = PENDING
+        if self.cancel.is_set():
+            # Left pending for the next run
+            return
+        self.outstanding += 1
+        self.downloaders.submit(self._download, key)
+
+    def _finish_one(self):
+        with self.lock:
+            self.outstanding -= 1
+            if self.outstanding == 0:
+                self.idle.notify_all()
+
+    def _expand(self, url):
+        try:
+            video_urls = self.expand(url)
+        except Exception as e:
+            with self.lock:
+                self.state["sources"][url]["status"] = FAILED
+                self.expanding.discard(url)
+                self.save()
+            self.emit("error", source=url, error=str(e))
+            self._finish_one()
+            return
+
+        new = 0
+        with self.lock:
+            audio_only = self.state["sources"][url].get("audio_only", False)
+            for video_url in video_urls:
+                key = video_id(video_url)
+                video = self.state["videos"].get(key)
+                if video is None:
+                    self.state["videos"][key] = {"url": video_url, "status": PENDING, "sources": [url],
+                                                 "audio_only": audio_only}
+                    self._download_later(key)
+                    new += 1
+                elif url not in video["sources"]:
+                    video["sources"].append(url)
+            self.state["sources"][url] = {"status": DONE, "videos": len(video_urls), "audio_only": audio_only}
+            self.expanding.discard(url)
+            self.save()
+        self.emit("expanded", source=url, videos=len(video_urls), new=new)
+        self._finish_one()
+
+    def _download(self, key):
+        with self.lock:
+            video = self.state["videos"][key]
+            if video["status"] != PENDING:
+                self._finish_one()
+                return
+            video["status"] = RUNNING
+            url = video["url"]
+            audio_only = video.get("audio_only", False)
+
+        self.emit("start", url=url)
+        try:
+            result = self.download(url, audio_only)
+        except Exception as e:
+            if self.cancel.is_set():
+                # Interrupted, not failed: the next run downloads it again
+                with self.lock:
+                    video["status"] = PENDING
+                    self.save()
+                self._finish_one()
+                return
+            if not isinstance(e, (OSError, DownloadError)):
+                traceback.print_exc()
+            with self.lock:
+                video.update(status=FAILED, error=str(e))
+                self.save()
+            self.emit("error", url=url, error=str(e))
+        else:
+            with self.lock:
+                video.update(status=DONE, file=result)
+                video.pop("error", None)
+                self.save()
+            self.emit("done", url=url, file=result)
+        self._finish_one()
+
+    def counts(self):
+        """Videos per status, plus the number of sources that could not be expanded."""
+        with self.lock:
+            counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for video in self.state["videos"].values():
+                counts[video["status"]] += 1
+            counts["sources_failed"] = sum(source["status"] == FAILED for source in self.state["sources"].values())
+            return counts
+
+    def wait(self):
+        """Block until every queued source and video has been handled."""
+        with self.lock:
+            while self.outstanding:
+                self.idle.wait()
+        return self.counts()
+
+    @property
+    def busy(self):
+        with self.lock:
+            return self.outstanding > 0
+
+    def shutdown(self, cancel=False):
+        """Stop the workers; with ``cancel`` queued videos are dropped and running ones told to stop.
+
+        Cancelled videos stay pending in the state file. Source expansion is not waited for.
+        """
+        if cancel:
+            self.cancel.set()
+        self.expanders.shutdown(wait=not cancel, cancel_futures=cancel)
+        self.downloaders.shutdown(wait=True, cancel_futures=cancel)
+        self.save()
@@ -0,0 +1,164 @@
+"""Per-directory library index with play statistics, and multi-root scanning.
+
+The index lives next to the videos as a small JSON file so every tool working
+on the directory (player, downloaders, CLI) sees the same play history.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from hitplayer_core.download import MEDIA_EXTENSIONS, VIDEO_EXTENSIONS
+
+INDEX_FILE_NAME = '.hitplayer_index.json'
+
+
+def is_partial(name):
+    """True for download and remux temp files like ``x.mp4.video.mp4`` or ``x.m4a.part.m4a``."""
+    return any(extension + '.' in name for extension in MEDIA_EXTENSIONS)
+
+
+def list_videos(directory, extensions=VIDEO_EXTENSIONS, recursive=False):
+    """Video file names in ``directory``; with ``recursive``, paths relative to it."""
+    if not recursive:
+        return [f for f in os.listdir(directory) if f.endswith(extensions)]
+    videos = []
+    for parent, directories, files in os.walk(directory):
+        directories[:] = sorted(d for d in directories if not d.startswith('.'))
+        relative = os.path.relpath(parent, directory)
+        for f in files:
+            if f.endswith(extensions):
+                videos.append(f if relative == '.' else os.path.join(relative, f))
+    return videos
+
+
+class RootStatus:
+    def __init__(self, root):
+        self.root = root
+        self.ok = False
+        self.error = None
+        self.count = 0
+        self.seconds = 0.0
+
+    def __repr__(self):
+        state = f"{self.count} videos" if self.ok else f"error: {self.error}"
+        return f"RootStatus({self.root!r}, {state}, {self.seconds:.3f}s)"
+
+
+class ScanResult:
+    def __init__(self):
+        # (root, name relative to root) in root order
+        self.videos = []
+        self.roots = OrderedDict()
+
+    @property
+    def seconds(self):
+        return max((status.seconds for status in self.roots.values()), default=0.0)
+
+
+def _scan_device(roots, recursive, extensions):
+    scanned = []
+    for root in roots:
+        status = RootStatus(root)
+        videos = []
+        start = time.perf_counter()
+        try:
+            videos = sorted(list_videos(root, extensions, recursive))
+            status.count = len(videos)
+            status.ok = True
+        except OSError as e:
+            status.error = str(e)
+        status.seconds = time.perf_counter() - start
+        scanned.append((status, videos))
+    return scanned
+
+
+def scan_roots(roots, recursive=False, extensions=VIDEO_EXTENSIONS):
+    """Scan several library roots concurrently and merge them into one result.
+
+    Roots on the same device are scanned one after another by one worker, so a
+    slow network mount only holds up its own roots.
+    """
+    roots = list(OrderedDict.fromkeys(roots))
+    result = ScanResult()
+    videos_by_root = {}
+    by_device = OrderedDict()
+    for root in roots:
+        result.roots[root] = RootStatus(root)
+        videos_by_root[root] = []
+        try:
+            device = os.stat(root).st_dev
+        except OSError as e:
+            result.roots[root].error = str(e)
+            continue
+        by_device.setdefault(device, []).append(root)
+
+    if by_device:
+        with ThreadPoolExecutor(max_workers=len(by_device)) as executor:
+            for scanned in executor.map(lambda group: _scan_device(group, recursive, extensions), by_device.values()):
+                for status, videos in scanned:
+                    result.roots[status.root] = status
+                    videos_by_root[status.root] = videos
+
+    for root in result.roots:
+        result.videos.extend((root, name) for name in videos_by_root[root])
+    return result
+
+
+class LibraryIndex:
+    def __init__(self, directory):
+        self.directory = directory
+        self.path = os.path.join(directory, INDEX_FILE_NAME)
+        self.lock = threading.RLock()
+        self.entries = {}
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as file:
+                self.entries = json.load(file)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def save(self):
+        with self.lock:
+            temp_path = self.path + '.tmp'
+            try:
+                with open(temp_path, 'w') as file:
+                    json.dump(self.entries, file, indent=1)
+                os.replace(temp_path, self.path)
+            except OSError as e:
+                print(f"Error saving library index: {str(e)}")
+
+    def record_play(self, name):
+        with self.lock:
+            entry = self.entries.setdefault(name, {})
+            entry["plays"] = entry.get("plays", 0) + 1
+            entry["last_played"] = time.time()
+            self.save()
+
+    def remove(self, name):
+        with self.lock:
+            if self.entries.pop(name, None) is not None:
+                self.save()
+
+    def last_used(self, name):
+        # Never played files count as used when they were last written
+        entry = self.entries.get(name, {})
+        if "last_played" in entry:
+            return entry["last_played"]
+        try:
+            return os.path.getmtime(os.path.join(self.directory, name))
+        except OSError:
+            return 0
+
+    def least_recently_used(self):
+        """Video and audio file names in the directory, least recently played first.
+
+        Temp files of downloads in progress are left out.
+        """
+        with self.lock:
+            names = [name for name in list_videos(self.directory, MEDIA_EXTENSIONS) if not is_partial(name)]
+            return sorted(names, key=self.last_used)
@@ -0,0 +1,222 @@
+"""MP4 box layout analysis and faststart rewriting, in pure Python.
+
+A player can only start once it has read the moov atom. When moov sits after
+the media data the backend has to seek to the end of the file first, which is
+slow on network mounts. ``make_faststart`` moves moov in front of mdat and
+patches the chunk offset tables, without ffmpeg.
+
+    python -m hitplayer_core.mp4 ~/Videos          # report layout
+    python -m hitplayer_core.mp4 ~/Videos --fix    # rewrite slow-start files
+"""
+import argparse
+import json
+import os
+import shutil
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from hitplayer_core.dedup import iter_media_files
+
+# Boxes on the path from moov down to the chunk offset tables
+CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+COPY_BLOCK = 1 << 20
+
+
+class Mp4Error(Exception):
+    pass
+
+
+class Box:
+    def __init__(self, type, offset, size, header_size):
+        self.type = type
+        self.offset = offset
+        self.size = size
+        self.header_size = header_size
+
+    @property
+    def end(self):
+        return self.offset + self.size
+
+    def __repr__(self):
+        return f"Box({self.type.decode('latin-1')}, offset={self.offset}, size={self.size})"
+
+
+def _parse_header(header, offset, end):
+    if len(header) < 8:
+        raise Mp4Error(f"Truncated box header at {offset}")
+    size, type = struct.unpack('>I4s', header[:8])
+    header_size = 8
+    if size == 1:
+        if len(header) < 16:
+            raise Mp4Error(f"Truncated 64-bit box header at {offset}")
+        size = struct.unpack('>Q', header[8:16])[0]
+        header_size = 16
+    elif size == 0:
+        size = end - offset
+    if size < header_size or offset + size > end:
+        raise Mp4Error(f"Invalid size {size} for box {type!r} at {offset}")
+    return Box(type, offset, size, header_size)
+
+
+def read_top_level_boxes(file):
+    """List the top-level boxes of an open file, reading only their headers."""
+    file.seek(0, os.SEEK_END)
+    end = file.tell()
+    boxes = []
+    offset = 0
+    while offset < end:
+        file.seek(offset)
+        box = _parse_header(file.read(16), offset, end)
+        boxes.append(box)
+        offset = box.end
+    return boxes
+
+
+def iter_child_boxes(data, start, end):
+    offset = start
+    while offset + 8 <= end:
+        box = _parse_header(bytes(data[offset:offset + 16]), offset, end)
+        yield box
+        offset = box.end
+
+
+def analyze(path):
+    """Describe where moov sits relative to the media data of one file."""
+    result = {"path": path}
+    try:
+        result["size"] = os.path.getsize(path)
+        with open(path, 'rb') as file:
+            boxes = read_top_level_boxes(file)
+            types = [box.type for box in boxes]
+            if b'moov' not in types:
+                raise Mp4Error("No moov box")
+            moov = boxes[types.index(b'moov')]
+            file.seek(moov.offset)
+            moov_data = file.read(moov.size)
+        # Walking moov's children also catches corrupt box sizes inside it
+        fragmented = b'moof' in types or any(child.type == b'mvex'
+                                             for child in iter_child_boxes(moov_data, moov.header_size, moov.size))
+    except (OSError, Mp4Error) as e:
+        result.update(valid=False, error=str(e))
+        return result
+
+    mdat_offsets = [box.offset for box in boxes if box.type == b'mdat']
+    result.update(
+        valid=True,
+        boxes=[box.type.decode('latin-1') for box in boxes],
+        moov_offset=moov.offset,
+        moov_size=moov.size,
+        first_mdat_offset=min(mdat_offsets) if mdat_offsets else None,
+        faststart=not mdat_offsets or moov.offset < min(mdat_offsets),
+        fragmented=fragmented,
+    )
+    return result
+
+
+def scan_library(paths, workers=8):
+    """Analyze many files in parallel; each file only costs a few header reads."""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(analyze, paths))
+
+
+def _patch_chunk_offsets(moov, start, end, shift_from, shift_to, delta):
+    for box in iter_child_boxes(moov, start, end):
+        body = box.offset + box.header_size
+        if box.type in CONTAINER_BOXES:
+            _patch_chunk_offsets(moov, body, box.end, shift_from, shift_to, delta)
+        elif box.type in (b'stco', b'co64'):
+            count = struct.unpack_from('>I', moov, body + 4)[0]
+            entry_format, entry_size = ('>I', 4) if box.type == b'stco' else ('>Q', 8)
+            for i in range(count):
+                position = body + 8 + i * entry_size
+                offset = struct.unpack_from(entry_format, moov, position)[0]
+                if shift_from <= offset < shift_to:
+                    offset += delta
+                    if box.type == b'stco' and offset > 0xFFFFFFFF:
+                        raise Mp4Error("Chunk offsets would overflow stco; use the ffmpeg faststart remux")
+                    struct.pack_into(entry_format, moov, position, offset)
+
+
+def _copy_range(source, target, offset, size):
+    source.seek(offset)
+    while size:
+        block = source.read(min(COPY_BLOCK, size))
+        if not block:
+            raise Mp4Error("File shrank while rewriting")
+        target.write(block)
+        size -= len(block)
+
+
+def make_faststart(path):
+    """Move moov in front of the media data; returns False if nothing to do.
+
+    The new layout is written to a temporary file in the same directory,
+    fsynced and renamed over the original, so a crash leaves either the old or
+    the new file, never a mix. The file keeps its permission bits, but it is a
+    new inode: hard links to it (e.g. from dedup --link) keep the old layout.
+    """
+    with open(path, 'rb') as source:
+        boxes = read_top_level_boxes(source)
+        types = [box.type for box in boxes]
+        if b'moov' not in types or b'mdat' not in types or b'moof' in types:
+            return False
+        moov_box = boxes[types.index(b'moov')]
+        first_mdat = boxes[types.index(b'mdat')]
+        if moov_box.offset < first_mdat.offset:
+            return False
+
+        source.seek(moov_box.offset)
+        moov = bytearray(source.read(moov_box.size))
+        # Everything from the first mdat up to the old moov moves back by moov's size
+        _patch_chunk_offsets(moov, moov_box.header_size, moov_box.size, first_mdat.offset, moov_box.offset,
+                             moov_box.size)
+
+        temp_path = path + '.faststart'
+        try:
+            with open(temp_path, 'wb') as target:
+                for box in boxes:
+                    if box is first_mdat:
+                        target.write(moov)
+                    if box is not moov_box:
+                        _copy_range(source, target, box.offset, box.size)
+                target.flush()
+                os.fsync(target.fileno())
+            shutil.copymode(path, temp_path)
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    directory_fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(directory_fd)
+    finally:
+        os.close(directory_fd)
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m hitplayer_core.mp4",
+                                     description="Find (and fix) mp4 files whose moov atom is at the end.")
+    parser.add_argument("directories", nargs="+")
+    parser.add_argument("--fix", action="store_true", help="rewrite slow-start files to faststart layout")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args(argv)
+
+    paths = [path for directory in args.directories for path in iter_media_files(directory, ('.mp4', '.m4a', '.m4v'))]
+    results = scan_library(paths, args.workers)
+    for result in results:
+        if args.fix and result["valid"] and not result["faststart"] and not result["fragmented"]:
+            try:
+                result["fixed"] = make_faststart(result["path"])
+            except (OSError, Mp4Error) as e:
+                result["fixed"] = False
+                result["error"] = str(e)
+        print(json.dumps(result))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Warm the page cache for the videos likely to play next.
+
+Starting the next video on a spinning disk or NFS mount stalls on cold reads.
+The prefetcher asks the kernel to read ahead the head (and the last MiB, where
+a moov atom may live) of the predicted next files on a background thread. A
+byte budget caps how much it keeps warm, so it never pushes the currently
+playing file out of the cache.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+DEFAULT_BUDGET = 256 << 20
+DEFAULT_HEAD = 16 << 20
+TAIL_BYTES = 1 << 20
+READ_BLOCK = 1 << 20
+
+
+def predict_next(order, current_index, history=(), count=2):
+    """The next ``count`` items after ``current_index``, wrapping like autoplay.
+
+    Items played recently are pushed to the back of the prediction, since the
+    user tends to skip what they just watched.
+    """
+    if not order:
+        return []
+    following = [order[(current_index + offset) % len(order)] for offset in range(1, len(order))]
+    recent = set(list(history)[-max(1, len(order) // 2):])
+    ranked = [item for item in following if item not in recent] + [item for item in following if item in recent]
+    return ranked[:count]
+
+
+class PrefetchMetrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_warmed = 0
+        self.files_warmed = 0
+        self.startup_times = deque(maxlen=200)
+
+    def record_startup(self, seconds, prefetched):
+        with self.lock:
+            self.startup_times.append((seconds, prefetched))
+
+    def snapshot(self):
+        with self.lock:
+            plays = self.hits + self.misses
+
+            def average(prefetched):
+                times = [seconds for seconds, was_prefetched in self.startup_times if was_prefetched == prefetched]
+                return round(sum(times) / len(times), 4) if times else None
+
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / plays, 3) if plays else None,
+                "files_warmed": self.files_warmed,
+                "bytes_warmed": self.bytes_warmed,
+                "startup_seconds_prefetched": average(True),
+                "startup_seconds_cold": average(False),
+            }
+
+
+def _warm_range(fd, offset, length):
+    if hasattr(os, 'posix_fadvise'):
+        # Asynchronous readahead; returns immediately
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+        return
+    os.lseek(fd, offset, os.SEEK_SET)
+    while length > 0:
+        block = os.read(fd, min(READ_BLOCK, length))
+        if not block:
+            break
+        length -= len(block)
+
+
+class Prefetcher(threading.Thread):
+    def __init__(self, budget_bytes=DEFAULT_BUDGET, head_bytes=DEFAULT_HEAD, depth=2):
+        super().__init__(daemon=True)
+        self.budget_bytes = budget_bytes
+        self.head_bytes = head_bytes
+        self.depth = depth
+        self.metrics = PrefetchMetrics()
+        self.condition = threading.Condition()
+        self.pending = []
+        self.warmed = OrderedDict()
+        self.stopped = False
+
+    def schedule(self, paths):
+        """Replace the pending work with a fresh prediction."""
+        with self.condition:
+            self.pending = [path for path in paths[:self.depth] if path not in self.warmed]
+            self.condition.notify()
+        if not self.is_alive() and not self.stopped:
+            self.start()
+
+    def note_play(self, path):
+        """Call when ``path`` starts playing; returns True on a prefetch hit."""
+        with self.condition:
+            hit = self.warmed.pop(path, None) is not None
+        with self.metrics.lock:
+            if hit:
+                self.metrics.hits += 1
+            else:
+                self.metrics.misses += 1
+        return hit
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopped:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                path = self.pending.pop(0)
+            try:
+                self.warm(path)
+            except OSError as e:
+                print(f"Error prefetching {path}: {str(e)}")
+
+    def warm(self, path):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            size = os.fstat(fd).st_size
+            head = min(size, self.head_bytes)
+            tail = min(TAIL_BYTES, size - head)
+            _warm_range(fd, 0, head)
+            if tail:
+                _warm_range(fd, size - tail, tail)
+        finally:
+            os.close(fd)
+
+        with self.condition:
+            self.warmed[path] = head + tail
+            # Forget the oldest warmed files once over budget, so later
+            # predictions can warm them again instead of trusting a stale entry
+            while sum(self.warmed.values()) > self.budget_bytes and len(self.warmed) > 1:
+                self.warmed.popitem(last=False)
+        with self.metrics.lock:
+            self.metrics.files_warmed += 1
+            self.metrics.bytes_warmed += head + tail
+
+
+class StartupTimer:
+    """Measures the time from setting media to the first buffered frame."""
+
+    def __init__(self):
+        self.started = None
+        self.prefetched = False
+
+    def start(self, prefetched):
+        self.started = time.perf_counter()
+        self.prefetched = prefetched
+
+    def stop(self):
+        if self.started is None:
+            return None
+        elapsed = time.perf_counter() - self.started
+        self.started = None
+        return elapsed
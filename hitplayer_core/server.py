@@ -0,0 +1,204 @@
+"""Local HTTP media server over a video directory.
+
+Several player windows or LAN kiosks can stream from one box instead of each
+opening the files themselves. File bodies go out with ``os.sendfile`` (or an
+mmap where sendfile is missing), so bytes move from the shared page cache to
+the socket without a copy through Python.
+
+    GET /library.json      the library index as JSON
+    GET /media/<name>      a video, with single byte range support
+
+    python -m hitplayer_core.server ~/Videos --host 0.0.0.0 --port 8765
+"""
+import argparse
+import json
+import mimetypes
+import mmap
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import quote, unquote
+
+from hitplayer_core.download import MEDIA_EXTENSIONS
+from hitplayer_core.library import LibraryIndex, list_videos
+
+SERVER_ENVIRONMENT_VARIABLE = 'HITPLAYER_MEDIA_SERVER'
+DEFAULT_PORT = 8765
+SENDFILE_BLOCK = 8 << 20
+
+_RANGE_PATTERN = re.compile(r'bytes=(\d*)-(\d*)$')
+
+
+def parse_range(header, size):
+    """Return (start, end) inclusive for a Range header, None for the whole file.
+
+    Raises ValueError for ranges that cannot be satisfied.
+    """
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Multiple or malformed ranges: serve the whole file as allowed by RFC 7233
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+class MediaRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "HitPlayerMedia/1.0"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_HEAD(self):
+        self.handle_request(send_body=False)
+
+    def do_GET(self):
+        self.handle_request(send_body=True)
+
+    def handle_request(self, send_body):
+        path = self.path.split('?', 1)[0]
+        if path == '/library.json':
+            self.send_library(send_body)
+        elif path.startswith('/media/'):
+            self.send_media(unquote(path[len('/media/'):]), send_body)
+        else:
+            self.send_error(404)
+
+    def send_library(self, send_body):
+        index = self.server.index
+        # Players record plays in the index file, so pick up their changes
+        index.load()
+        entries = []
+        for name in sorted(list_videos(self.server.directory, MEDIA_EXTENSIONS)):
+            try:
+                stat = os.stat(os.path.join(self.server.directory, name))
+            except OSError:
+                continue
+            entry = dict(index.entries.get(name, {}), name=name, size=stat.st_size, mtime=stat.st_mtime,
+                         url='/media/' + quote(name))
+            entries.append(entry)
+        body = json.dumps(entries).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+        if send_body:
+            self.wfile.write(body)
+
+    def send_media(self, name, send_body):
+        # Only plain media file names inside the served directory, the same files /library.json lists
+        if (not name or name != os.path.basename(name) or name.startswith('.')
+                or not name.endswith(MEDIA_EXTENSIONS)):
+            self.send_error(404)
+            return
+        try:
+            file = open(os.path.join(self.server.directory, name), 'rb')
+        except OSError:
+            self.send_error(404)
+            return
+
+        with file:
+            size = os.fstat(file.fileno()).st_size
+            try:
+                byte_range = parse_range(self.headers.get('Range', ''), size) if 'Range' in self.headers else None
+            except ValueError:
+                self.send_response(416)
+                self.send_header('Content-Range', f'bytes */{size}')
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+
+            if byte_range is None:
+                start, end = 0, size - 1
+                self.send_response(200)
+            else:
+                start, end = byte_range
+                self.send_response(206)
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            length = max(0, end - start + 1)
+            self.send_header('Content-Type', mimetypes.guess_type(name)[0] or 'application/octet-stream')
+            self.send_header('Content-Length', str(length))
+            self.send_header('Accept-Ranges', 'bytes')
+            self.end_headers()
+
+            if send_body and length:
+                if self.server.use_sendfile:
+                    self.send_with_sendfile(file, start, length)
+                else:
+                    self.send_with_mmap(file, start, length)
+
+    def send_with_sendfile(self, file, offset, length):
+        self.wfile.flush()
+        socket_fd = self.connection.fileno()
+        while length:
+            sent = os.sendfile(socket_fd, file.fileno(), offset, min(length, SENDFILE_BLOCK))
+            if sent == 0:
+                break
+            offset += sent
+            length -= sent
+
+    def send_with_mmap(self, file, offset, length):
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            self.wfile.write(memoryview(data)[offset:offset + length])
+
+
+class MediaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, directory, host='127.0.0.1', port=DEFAULT_PORT, use_sendfile=None, verbose=False):
+        super().__init__((host, port), MediaRequestHandler)
+        self.directory = directory
+        self.index = LibraryIndex(directory)
+        self.use_sendfile = hasattr(os, 'sendfile') if use_sendfile is None else use_sendfile
+        self.verbose = verbose
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Serve on a background thread."""
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m hitplayer_core.server",
+                                     description="Serve a video directory to players over HTTP.")
+    parser.add_argument("directory")
+    parser.add_argument("--host", default="127.0.0.1", help="use 0.0.0.0 to serve the LAN")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    server = MediaServer(args.directory, args.host, args.port, verbose=args.verbose)
+    print(f"Serving {args.directory} at {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+"""Stream selection policy.
+
+Instead of asking for one hardcoded resolution, walk a resolution ladder from
+the top and take the first rung that fits the size and bitrate budget. Adaptive
+(video-only + audio-only) pairs can be allowed as well; they are muxed locally
+with ffmpeg after download.
+"""
+import os
+import shutil
+import subprocess
+
+DEFAULT_LADDER = ("720p", "480p", "360p", "240p", "144p")
+
+AUDIO_EXTENSIONS = {"mp4": ".m4a", "webm": ".webm"}
+
+
+class Selection:
+    def __init__(self, video=None, audio=None):
+        # A progressive stream is stored as video with no separate audio
+        self.video = video
+        self.audio = audio
+
+    @property
+    def streams(self):
+        return [stream for stream in (self.video, self.audio) if stream is not None]
+
+    @property
+    def filesize(self):
+        return sum(stream.filesize for stream in self.streams)
+
+    @property
+    def needs_mux(self):
+        return self.video is not None and self.audio is not None
+
+    @property
+    def extension(self):
+        if self.video is None:
+            return AUDIO_EXTENSIONS.get(self.audio.subtype, "." + self.audio.subtype)
+        return ".mp4"
+
+    @property
+    def title(self):
+        return self.streams[0].title
+
+
+class StreamPolicy:
+    def __init__(self, ladder=DEFAULT_LADDER, max_filesize=None, max_bitrate=None, audio_only=False,
+                 adaptive=False):
+        self.ladder = tuple(ladder)
+        self.max_filesize = max_filesize
+        self.max_bitrate = max_bitrate
+        self.audio_only = audio_only
+        self.adaptive = adaptive
+
+    def _fits(self, *streams):
+        if self.max_bitrate is not None and sum(stream.bitrate or 0 for stream in streams) > self.max_bitrate:
+            return False
+        # filesize may cost a HEAD request, so only look at it when there is a budget
+        if self.max_filesize is not None and sum(stream.filesize for stream in streams) > self.max_filesize:
+            return False
+        return True
+
+    def _best_audio(self, streams):
+        candidates = sorted(streams.filter(only_audio=True), key=lambda s: (s.subtype == "mp4", s.bitrate or 0),
+                            reverse=True)
+        for stream in candidates:
+            if self._fits(stream):
+                return stream
+        return None
+
+    def select(self, streams):
+        """Pick streams from a pytube StreamQuery; returns a Selection or None."""
+        if self.audio_only:
+            audio = self._best_audio(streams)
+            return Selection(audio=audio) if audio is not None else None
+
+        progressive = streams.filter(progressive=True, file_extension="mp4")
+        video_only = streams.filter(only_video=True, file_extension="mp4") if self.adaptive else None
+        audio = self._best_audio(streams.filter(file_extension="mp4")) if self.adaptive else None
+
+        for resolution in self.ladder:
+            for stream in progressive.filter(resolution=resolution):
+                if self._fits(stream):
+                    return Selection(video=stream)
+            if audio is not None:
+                for stream in video_only.filter(resolution=resolution):
+                    if self._fits(stream, audio):
+                        return Selection(video=stream, audio=audio)
+
+        # Nothing on the ladder; settle for the largest progressive stream in budget
+        for stream in progressive.order_by("resolution").desc():
+            if self._fits(stream):
+                return Selection(video=stream)
+        return None
+
+
+def mux(video_path, audio_path, output_path):
+    """Combine separate video and audio files into one mp4 without re-encoding."""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg is required to mux adaptive streams")
+    temp_path = output_path + ".mux.mp4"
+    subprocess.run([ffmpeg, "-v", "error", "-y", "-i", video_path, "-i", audio_path,
+                    "-map", "0:v:0", "-map", "1:a:0", "-c", "copy", "-movflags", "+faststart", temp_path],
+                   check=True, stdin=subprocess.DEVNULL)
+    os.replace(temp_path, output_path)
+
+
+def store_audio(input_path, output_path, tags=None):
+    """Copy the audio of an audio-only download into a tagged file without re-encoding.
+
+    Container metadata from YouTube is dropped; ``tags`` like {"title": ..., "artist": ...}
+    are written instead.
+    """
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError("ffmpeg is required to tag audio files")
+    extension = os.path.splitext(output_path)[1]
+    temp_path = output_path + ".tag" + extension
+    command = [ffmpeg, "-v", "error", "-y", "-i", input_path, "-map", "0:a:0", "-c", "copy", "-map_metadata", "-1"]
+    for key, value in sorted((tags or {}).items()):
+        if value:
+            command += ["-metadata", f"{key}={value}"]
+    if extension == ".m4a":
+        command += ["-movflags", "+faststart"]
+    subprocess.run(command + [temp_path], check=True, stdin=subprocess.DEVNULL)
+    os.replace(temp_path, output_path)
@@ -0,0 +1,219 @@
+"""Bandwidth limiting shared by concurrent downloads.
+
+Downloads charge every chunk they write to one TokenBucket, so the limit holds
+for the sum of all transfers. A ScheduledBucket also follows time-of-day
+windows, for example full speed at night and throttled during office hours:
+
+    mon-fri 09:00-18:00=512K, sat,sun 10:00-14:00=pause
+
+Windows are separated by commas or semicolons and may wrap past midnight
+(``22:00-06:00``). Outside all windows the rate
+is the schedule's default, unlimited unless set with ``*=RATE``.
+"""
+import asyncio
+import datetime
+import os
+import re
+import threading
+import time
+
+from hitplayer_core.admission import parse_size
+
+SCHEDULE_ENVIRONMENT_VARIABLE = 'HITPLAYER_BANDWIDTH_SCHEDULE'
+PAUSE_POLL = 1.0
+DAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+
+class TokenBucket:
+    """Token bucket over bytes per second.
+
+    ``rate=None`` means unlimited and ``rate=0`` pauses every download until a
+    new rate is set. The bucket goes into debt for large chunks and makes the
+    caller sleep it off, so the average rate holds across all threads.
+    """
+
+    def __init__(self, rate=None, burst=None):
+        self.lock = threading.Lock()
+        self.rate = rate
+        self.burst = burst
+        self.tokens = self._burst()
+        self.updated = time.monotonic()
+
+    def _burst(self):
+        return self.burst or (self.rate or 0)
+
+    def _current_rate(self, now):
+        return self.rate
+
+    def set_rate(self, rate):
+        """Change the rate live; sleeping downloads pick it up on their next chunk."""
+        with self.lock:
+            self.rate = rate
+            self.tokens = min(self.tokens, self._burst())
+
+    def follow_schedule(self):
+        """Drop a fixed rate; without a schedule that means unlimited."""
+        self.set_rate(None)
+
+    def _take(self, amount):
+        # Returns (seconds to sleep, whether the amount was charged)
+        with self.lock:
+            now = time.monotonic()
+            rate = self._current_rate(now)
+            if rate is None:
+                self.updated = now
+                return 0, True
+            if rate == 0:
+                self.updated = now
+                return PAUSE_POLL, False
+            burst = self.burst or rate
+            self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+            self.updated = now
+            self.tokens -= amount
+            return (-self.tokens / rate if self.tokens < 0 else 0), True
+
+    def consume(self, amount, cancel=None):
+        """Charge ``amount`` bytes, sleeping as long as the rate requires.
+
+        Returns False as soon as ``cancel`` (a threading.Event) is set, True otherwise.
+        """
+        while True:
+            wait, charged = self._take(amount)
+            if wait:
+                if cancel is None:
+                    time.sleep(wait)
+                elif cancel.wait(wait):
+                    return False
+            if charged:
+                return True
+
+    async def consume_async(self, amount):
+        """Like consume, but sleeps without blocking the event loop."""
+        while True:
+            wait, charged = self._take(amount)
+            if wait:
+                await asyncio.sleep(wait)
+            if charged:
+                return
+
+
+class Schedule:
+    def __init__(self, windows=(), default=None):
+        # windows: (days, start minute, end minute, rate)
+        self.windows = list(windows)
+        self.default = default
+
+    @classmethod
+    def parse(cls, text):
+        windows = []
+        default = None
+        for part in _split_windows(text):
+            spec, _, rate_text = part.rpartition('=')
+            if not spec:
+                raise ValueError(f"Invalid schedule window: {part!r}")
+            rate = _parse_rate(rate_text.strip())
+            if spec.strip() == '*':
+                default = rate
+                continue
+            match = re.fullmatch(r'(?:([a-z,-]+)\s+)?(\d{1,2}):(\d{2})-(\d{1,2}):(\d{2})', spec.strip().lower())
+            if not match:
+                raise ValueError(f"Invalid schedule window: {part!r}")
+            days = _parse_days(match.group(1)) if match.group(1) else set(range(7))
+            hours = int(match.group(2)), int(match.group(4))
+            minutes = int(match.group(3)), int(match.group(5))
+            if max(hours) > 23 or max(minutes) > 59:
+                raise ValueError(f"Invalid time in schedule window: {part!r}")
+            windows.append((days, hours[0] * 60 + minutes[0], hours[1] * 60 + minutes[1], rate))
+        return cls(windows, default)
+
+    def rate_at(self, when):
+        minute = when.hour * 60 + when.minute
+        weekday = when.weekday()
+        for days, start, end, rate in self.windows:
+            if start <= end:
+                if weekday in days and start <= minute < end:
+                    return rate
+            # Window wraps past midnight; the part after midnight belongs to the previous day
+            elif (weekday in days and minute >= start) or ((weekday - 1) % 7 in days and minute < end):
+                return rate
+        return self.default
+
+
+def _split_windows(text):
+    # Windows are separated by ';' or by a comma after a complete "...=RATE";
+    # other commas belong to a day list like "mon,wed"
+    parts = []
+    for group in text.split(';'):
+        current = ''
+        for piece in group.split(','):
+            if '=' in current:
+                parts.append(current.strip())
+                current = piece
+            else:
+                current = current + ',' + piece if current else piece
+        parts.append(current.strip())
+    return [part for part in parts if part]
+
+
+def _parse_rate(text):
+    if text.lower() in ('pause', 'off', '0'):
+        return 0
+    if text.lower() in ('unlimited', 'full', 'none'):
+        return None
+    return parse_size(text)
+
+
+def _parse_days(text):
+    days = set()
+    for item in text.split(','):
+        first, _, last = item.strip().partition('-')
+        if first[:3] not in DAYS or (last and last[:3] not in DAYS):
+            raise ValueError(f"Invalid day in schedule: {item!r}")
+        start = DAYS.index(first[:3])
+        stop = DAYS.index(last[:3]) if last else start
+        day = start
+        while True:
+            days.add(day)
+            if day == stop:
+                break
+            day = (day + 1) % 7
+    return days
+
+
+class ScheduledBucket(TokenBucket):
+    """A TokenBucket whose rate follows a Schedule unless overridden."""
+
+    def __init__(self, schedule, burst=None, clock=datetime.datetime.now):
+        self.schedule = schedule
+        self.override = None
+        self.overridden = False
+        self.clock = clock
+        self.checked = 0
+        super().__init__(schedule.rate_at(clock()), burst)
+
+    def set_rate(self, rate):
+        """Override the schedule with a fixed rate (None = unlimited)."""
+        with self.lock:
+            self.overridden = True
+            self.rate = rate
+
+    def follow_schedule(self):
+        with self.lock:
+            self.overridden = False
+            self.checked = 0
+
+    def _current_rate(self, now):
+        # Looking at the wall clock once a second is plenty for minute-level windows
+        if not self.overridden and now - self.checked >= 1:
+            self.rate = self.schedule.rate_at(self.clock())
+            self.checked = now
+        return self.rate
+
+
+def limiter_from_environment(rate=None):
+    """Shared bucket for the Qt downloaders: fixed ``rate`` or the configured schedule."""
+    spec = os.environ.get(SCHEDULE_ENVIRONMENT_VARIABLE)
+    bucket = ScheduledBucket(Schedule.parse(spec)) if spec else TokenBucket()
+    if rate is not None:
+        bucket.set_rate(rate)
+    return bucket
@@ -0,0 +1,115 @@
+"""Post-download remux/transcode pipeline.
+
+Jobs run ffmpeg child processes, at most one per spare CPU, fed from a bounded
+queue. Progress is parsed from ffmpeg's ``-progress`` output and reported as a
+percentage.
+
+Profiles:
+    faststart   copy the video and audio streams into an mp4 with the moov atom at the front
+    h264-720p   re-encode to H.264/AAC, at most 720 lines high
+    h264-480p   re-encode to H.264/AAC, at most 480 lines high
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+PROFILES = {
+    # Subtitle, data and attachment streams from mkv inputs may have no mp4 mapping, so leave them out
+    "faststart": ["-map", "0:v", "-map", "0:a?", "-sn", "-dn", "-c", "copy"],
+    "h264-720p": ["-sn", "-dn", "-c:v", "libx264", "-preset", "veryfast", "-crf", "23",
+                  "-vf", "scale=-2:'min(720,ih)'", "-c:a", "aac", "-b:a", "128k"],
+    "h264-480p": ["-sn", "-dn", "-c:v", "libx264", "-preset", "veryfast", "-crf", "25",
+                  "-vf", "scale=-2:'min(480,ih)'", "-c:a", "aac", "-b:a", "96k"],
+}
+
+
+def _tool(name):
+    path = shutil.which(name)
+    if path is None:
+        raise RuntimeError(f"{name} is required for transcoding")
+    return path
+
+
+def probe_duration(path):
+    """Media duration in seconds, or None when ffprobe cannot tell."""
+    result = subprocess.run([_tool("ffprobe"), "-v", "error", "-show_entries", "format=duration",
+                             "-of", "default=noprint_wrappers=1:nokey=1", path],
+                            capture_output=True, text=True, stdin=subprocess.DEVNULL)
+    try:
+        return float(result.stdout.strip())
+    except ValueError:
+        return None
+
+
+def transcode(input_path, profile="faststart", on_progress=None, threads=0):
+    """Run one profile over ``input_path`` and return the resulting mp4 path.
+
+    The result replaces the input (an .avi/.mkv input is removed once its .mp4
+    is written). ``on_progress`` is called with a percentage.
+    """
+    output_path = os.path.splitext(input_path)[0] + ".mp4"
+    temp_path = output_path + ".transcode.mp4"
+    duration = probe_duration(input_path) if on_progress is not None else None
+
+    command = [_tool("ffmpeg"), "-v", "error", "-nostats", "-y", "-i", input_path, *PROFILES[profile],
+               "-threads", str(threads), "-movflags", "+faststart", "-progress", "pipe:1", temp_path]
+    # stderr goes to a file: a pipe read only after stdout closes can fill up and stall ffmpeg
+    with tempfile.TemporaryFile(mode="w+") as errors:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors, stdin=subprocess.DEVNULL,
+                                   text=True)
+        last_percent = -1
+        for line in process.stdout:
+            if duration and line.startswith("out_time_us="):
+                try:
+                    percent = min(99, int(int(line.split("=", 1)[1]) / (duration * 1e4)))
+                except ValueError:
+                    continue
+                if percent != last_percent:
+                    last_percent = percent
+                    on_progress(percent)
+        if process.wait() != 0:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            errors.seek(0)
+            raise RuntimeError(f"ffmpeg failed on {input_path}: {errors.read().strip()}")
+
+    os.replace(temp_path, output_path)
+    if output_path != input_path:
+        os.remove(input_path)
+    if on_progress is not None:
+        on_progress(100)
+    return output_path
+
+
+class TranscodePool:
+    """Bounded, CPU-aware queue of transcode jobs.
+
+    ``submit`` blocks once ``max_queue`` jobs are waiting, so a fast downloader
+    cannot pile up unbounded work behind a slow encoder.
+    """
+
+    def __init__(self, workers=None, max_queue=32):
+        cpus = os.cpu_count() or 1
+        self.workers = workers or max(1, cpus - 1)
+        # Split the CPUs between concurrent ffmpeg processes instead of oversubscribing
+        self.threads_per_job = max(1, cpus // self.workers)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="transcode")
+        self.slots = threading.BoundedSemaphore(self.workers + max_queue)
+
+    def submit(self, path, profile="faststart", on_progress=None):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown transcode profile: {profile}")
+        self.slots.acquire()
+        try:
+            future = self.executor.submit(transcode, path, profile, on_progress, self.threads_per_job)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future
+
+    def shutdown(self, wait=True, cancel=False):
+        self.executor.shutdown(wait=wait, cancel_futures=cancel)